@@ -7,7 +7,7 @@ from alembic import context
 from app.core.config import settings
 
 # Import your models so that they register with Base
-from app.models import user, game
+from app.models import user, game, move
 from app.core.database import Base
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,45 @@
+"""add imported games
+
+Revision ID: 7c2e5a9f1d36
+Revises: 0b6f2d9e4c73
+Create Date: 2026-10-18 19:32:05.118204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "7c2e5a9f1d36"
+down_revision: Union[str, None] = "0b6f2d9e4c73"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TYPE gametype ADD VALUE IF NOT EXISTS 'IMPORTED'")
+    op.alter_column(
+        "games", "player_white_id", existing_type=sa.String(length=36), nullable=True
+    )
+
+
+def downgrade() -> None:
+    # Postgres cannot drop an enum value: drop the imported games and
+    # recreate the type without it
+    op.execute(
+        "DELETE FROM game_moves WHERE game_id IN "
+        "(SELECT id FROM games WHERE game_type = 'IMPORTED')"
+    )
+    op.execute("DELETE FROM games WHERE game_type = 'IMPORTED'")
+    op.alter_column(
+        "games", "player_white_id", existing_type=sa.String(length=36), nullable=False
+    )
+    op.execute("ALTER TYPE gametype RENAME TO gametype_old")
+    sa.Enum("MULTIPLAYER", "AI", name="gametype").create(op.get_bind())
+    op.execute(
+        "ALTER TABLE games ALTER COLUMN game_type TYPE gametype "
+        "USING game_type::text::gametype"
+    )
+    op.execute("DROP TYPE gametype_old")
@@ -1,24 +1,37 @@
-from fastapi import APIRouter, Depends, Request, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.game import (
+    AIMoveRequest,
+    DrawOfferResponse,
     GameAIRequest,
     GameAIResponse,
+    GameCreateRequest,
     GameResponse,
     JoinRequest,
+    LegalMovesResponse,
+    MatchmakingResponse,
     MoveRequest,
     MoveResponse,
 )
 from app.dependencies import get_db, get_redis_client
 from app.models.user import User
 from app.services.auth import get_current_active_user
+from app.services.clock import timed_out
+from app.services.matchmaking import matchmaker
 from app.models.game import Game
 from app.core.constants import GameStatus, GameType, RedisPublishType
 from app.services.game import (
+    find_stalled_ai_game,
+    get_legal_moves,
     join_existing_game_multiplayer,
+    offer_draw,
+    play_ai_reply,
     publish_redis,
     resign_ai_game,
     resign_game_multiplayer,
+    validate_and_commit_move_ai,
     validate_and_update_move_ai,
     validate_and_update_move_multiplayer,
 )
@@ -31,16 +44,45 @@ router = APIRouter(prefix="/game", tags=["game"])
     "/create", response_model=GameResponse, status_code=status.HTTP_201_CREATED
 )
 async def create_game(
+    payload: GameCreateRequest | None = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    game = Game(player_white_id=current_user.id, game_type=GameType.MULTIPLAYER)
+    payload = payload or GameCreateRequest()
+    game = Game(
+        player_white_id=current_user.id,
+        game_type=GameType.MULTIPLAYER,
+        time_base=payload.time_base,
+        time_increment=payload.time_increment,
+    )
     db.add(game)
     await db.commit()
     await db.refresh(game)
     return game
 
 
+# Queue for an opponent of similar skill; the match arrives on /ws/matchmaking
+@router.post("/matchmaking/enqueue", response_model=MatchmakingResponse)
+async def enqueue_matchmaking(
+    payload: GameCreateRequest | None = None,
+    current_user: User = Depends(get_current_active_user),
+):
+    payload = payload or GameCreateRequest()
+    pool = await matchmaker.enqueue(
+        user=current_user,
+        time_base=payload.time_base,
+        time_increment=payload.time_increment,
+    )
+    return MatchmakingResponse(pool=pool)
+
+
+@router.post("/matchmaking/cancel", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_matchmaking(
+    current_user: User = Depends(get_current_active_user),
+):
+    await matchmaker.cancel(user=current_user)
+
+
 @router.post("/join", response_model=GameResponse)
 async def join_game(
     payload: JoinRequest,
@@ -57,6 +99,18 @@ async def join_game(
     return game
 
 
+@router.get("/{game_id}/legal-moves", response_model=LegalMovesResponse)
+async def legal_moves(
+    game_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    game, moves = await get_legal_moves(
+        game_id=game_id, db=db, player_id=current_user.id
+    )
+    return LegalMovesResponse(fen=game.fen, moves=[move.uci() for move in moves])
+
+
 @router.post("/move")
 async def make_move(
     payload: MoveRequest,
@@ -64,13 +118,22 @@ async def make_move(
     current_user: User = Depends(get_current_active_user),
     redis_client: Redis = Depends(get_redis_client),
 ):
-    game = await validate_and_update_move_multiplayer(
+    game, moves = await validate_and_update_move_multiplayer(
         payload.game_id, payload.move, current_user.id, db
     )
+    publish_type = (
+        RedisPublishType.TIMEOUT if timed_out(game) else RedisPublishType.MOVE
+    )
     await publish_redis(
-        game=game, type=RedisPublishType.MOVE, redis_client=redis_client
+        game=game, type=publish_type, redis_client=redis_client, moves=moves
+    )
+    return MoveResponse(
+        fen=game.fen,
+        status=game.status,
+        winner=game.winner,
+        white_clock_ms=game.white_clock_ms,
+        black_clock_ms=game.black_clock_ms,
     )
-    return MoveResponse(fen=game.fen, status=game.status, winner=game.winner)
 
 
 @router.post("/resign")
@@ -90,6 +153,27 @@ async def resign_game(
     return MoveResponse(fen=game.fen, status=game.status, winner=game.winner)
 
 
+# Offer a draw, or accept the opponent's offer if one is standing
+@router.post("/draw", response_model=DrawOfferResponse)
+async def draw_game(
+    payload: JoinRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+    redis_client: Redis = Depends(get_redis_client),
+):
+    game, accepted = await offer_draw(
+        game_id=payload.game_id,
+        db=db,
+        player_id=current_user.id,
+        redis_client=redis_client,
+    )
+    publish_type = RedisPublishType.DRAW if accepted else RedisPublishType.DRAW_OFFER
+    await publish_redis(game=game, type=publish_type, redis_client=redis_client)
+    return DrawOfferResponse(
+        fen=game.fen, status=game.status, winner=game.winner, accepted=accepted
+    )
+
+
 @router.post(
     "/ai/create", response_model=GameAIResponse, status_code=status.HTTP_201_CREATED
 )
@@ -113,17 +197,48 @@ async def create_game_ai(
 
 @router.post("/ai/move")
 async def make_move_ai(
-    payload: MoveRequest,
+    payload: AIMoveRequest,
     request: Request,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
+    redis_client: Redis = Depends(get_redis_client),
 ):
-    game = await validate_and_update_move_ai(
-        game_id=payload.game_id,
-        move=payload.move,
-        player_id=current_user.id,
-        db=db,
-        request=request,
+    try:
+        if payload.async_reply:
+            game, moves = await validate_and_commit_move_ai(
+                game_id=payload.game_id,
+                move=payload.move,
+                player_id=current_user.id,
+                db=db,
+            )
+            if game.status == GameStatus.ONGOING:
+                background_tasks.add_task(
+                    play_ai_reply, game.id, request.app, redis_client
+                )
+        else:
+            game, moves = await validate_and_update_move_ai(
+                game_id=payload.game_id,
+                move=payload.move,
+                player_id=current_user.id,
+                db=db,
+                request=request,
+            )
+    except HTTPException as e:
+        if e.status_code != status.HTTP_400_BAD_REQUEST:
+            raise
+        game = await find_stalled_ai_game(payload.game_id, db, current_user.id)
+        if game is None:
+            raise
+        # The AI reply was lost, so play it now; the player moves once it lands
+        background_tasks.add_task(play_ai_reply, game.id, request.app, redis_client)
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"message": "Waiting for the AI reply, try again"},
+            background=background_tasks,
+        )
+    await publish_redis(
+        game=game, type=RedisPublishType.MOVE, redis_client=redis_client, moves=moves
     )
     return MoveResponse(fen=game.fen, status=game.status, winner=game.winner)
 
@@ -133,8 +248,12 @@ async def resign_game_ai(
     payload: JoinRequest,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
+    redis_client: Redis = Depends(get_redis_client),
 ):
     game = await resign_ai_game(
         game_id=payload.game_id, db=db, player_id=current_user.id
     )
+    await publish_redis(
+        game=game, type=RedisPublishType.RESIGN, redis_client=redis_client
+    )
     return MoveResponse(fen=game.fen, status=game.status, winner=game.winner)
@@ -1,14 +1,26 @@
+from datetime import date
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.future import select
 from app.schemas.auth import UserResponse
 from app.models.user import User
 from app.services.auth import get_current_active_user
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.dependencies import get_db
-from app.schemas.users import RecentGameResponse, UserStatsResponse
-from app.services.users import get_player_stats, get_recent_games_details
+from app.schemas.users import (
+    PgnImportResponse,
+    RecentGameResponse,
+    UserStatsResponse,
+)
+from app.core.config import settings
+from app.core.constants import GameType
+from app.services.pgn_import import PgnImporter, pgn_uploads
+from app.services.users import (
+    export_games_pgn,
+    get_player_stats,
+    get_recent_games_details,
+)
 
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -35,6 +47,32 @@ async def delete_user(
     return JSONResponse(status_code=status.HTTP_204_NO_CONTENT, content=None)
 
 
+# Import an archive of finished games from a PGN upload. `player_name` is how
+# the user is named in the file (their username by default); games they did
+# not play are skipped and opponents are not linked to accounts. Uploads share
+# one parser pool; when too many are running, new ones get a 503.
+@router.post("/me/games.pgn", response_model=PgnImportResponse)
+async def import_user_games(
+    file: UploadFile,
+    player_name: str | None = None,
+    current_user: User = Depends(get_current_active_user),
+):
+    player_name = player_name or current_user.username
+    if not player_name:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A player name is required",
+        )
+    async with pgn_uploads.slot() as pool:
+        importer = PgnImporter(
+            workers=settings.PGN_IMPORT_WORKERS,
+            batch=settings.PGN_IMPORT_BATCH,
+            owner=current_user,
+            player_name=player_name,
+        )
+        return await importer.run(file.read, pool)
+
+
 @router.get("/{username}/stats", response_model=UserStatsResponse)
 async def get_user_stats(
     username: str,
@@ -53,6 +91,26 @@ async def get_recent_games(
     return recent_games
 
 
+# Download all of a user's games as one PGN file, optionally filtered by the
+# date they were created (inclusive) and by game type
+@router.get("/{username}/games.pgn")
+async def export_user_games(
+    username: str,
+    since: date | None = None,
+    until: date | None = None,
+    game_type: GameType | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    pgn = await export_games_pgn(
+        username=username, db=db, since=since, until=until, game_type=game_type
+    )
+    return StreamingResponse(
+        pgn,
+        media_type="application/x-chess-pgn",
+        headers={"Content-Disposition": f'attachment; filename="{username}.pgn"'},
+    )
+
+
 @router.get("/{username}", response_model=UserResponse)
 async def get_user_by_id(username: str, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.username == username))
@@ -1,48 +1,282 @@
 import asyncio
-import json
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
-from redis.asyncio import Redis
-from app.dependencies import get_redis_client
+from typing import Awaitable, Callable, Literal
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from pydantic import ValidationError
+from app.core.constants import RedisPublishType
+from app.core.database import SessionLocal
+from app.core.redis_client import redis_client
+from app.schemas.game import FrameAck, GameFrame, MoveResponse
 from app.services.auth import verify_logged_in_user_ws
+from app.services.clock import timed_out
+from app.services.game import (
+    offer_draw,
+    publish_redis,
+    resign_game_multiplayer,
+    validate_and_update_move_multiplayer,
+)
+from app.services.game_events import (
+    current_seq,
+    decode,
+    encode,
+    encode_event,
+    events_since,
+    game_snapshot,
+)
+from app.services.pubsub_hub import pubsub_hub
 
 router = APIRouter(prefix="/ws", tags=["ws"])
 
+Payload = str | bytes
 
-@router.websocket("/game/{game_id}")
-async def game_ws(
+
+# Push every message published on the channel to the socket as soon as it
+# arrives, through the process-wide pubsub hub. A receive task runs alongside,
+# so a disconnect ends the relay at once instead of at the next publish; idle
+# sockets just wait on both. `on_start` gives payloads to send once subscribed
+# (so nothing published meanwhile is lost), `on_message` turns a published
+# message into the payloads to send, and `on_frame` answers the client's frames.
+async def relay_channel(
     websocket: WebSocket,
-    game_id: int,
-    redis_client: Redis = Depends(get_redis_client),
-    access_token: str = Depends(verify_logged_in_user_ws),
+    channel: str,
+    on_start: Callable[[], Awaitable[list[Payload]]] | None = None,
+    on_message: Callable[[str], Awaitable[list[Payload]]] | None = None,
+    on_frame: Callable[[Payload], Awaitable[Payload]] | None = None,
 ):
-    # Accept the connection and echo the token as the subprotocol.
-    await websocket.accept(subprotocol=access_token)
-    pubsub = redis_client.pubsub()
-    channel = f"game_{game_id}"
-    await pubsub.subscribe(channel)
+    lock = asyncio.Lock()
 
-    try:
+    async def send(payload: Payload):
+        async with lock:
+            if isinstance(payload, bytes):
+                await websocket.send_bytes(payload)
+            else:
+                await websocket.send_text(payload)
+
+    async def forward():
+        if on_start is not None:
+            for payload in await on_start():
+                await send(payload)
         while True:
-            try:
-                message = await pubsub.get_message(
-                    ignore_subscribe_messages=True, timeout=1.0
-                )
-            except asyncio.CancelledError:
-                break
-
-            if message:
-                try:
-                    data = json.loads(message["data"])
-                    await websocket.send_json(data)
-                except json.JSONDecodeError:
-                    continue  # skip bad JSON messages
-            await asyncio.sleep(0.1)
+            data = await queue.get()
+            if data is None:
+                # Fell too far behind; the client reconnects to catch up
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            if on_message is None:
+                # Payloads are published as JSON; pass them through as is
+                await send(data)
+                continue
+            for payload in await on_message(data):
+                await send(payload)
+
+    async def receive():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            frame = message.get("text")
+            if frame is None:
+                frame = message.get("bytes")
+            if on_frame is not None and frame is not None:
+                # Straight to the socket, never through the subscriber queue,
+                # so an ack is not lost behind a backlog of events
+                await send(await on_frame(frame))
+
+    queue = await pubsub_hub.subscribe(channel)
+    tasks = [asyncio.create_task(forward()), asyncio.create_task(receive())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
     except WebSocketDisconnect:
-        await pubsub.unsubscribe(channel)
+        pass
     finally:
-        await pubsub.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await pubsub_hub.unsubscribe(channel, queue)
         try:
             await websocket.close()
         except RuntimeError:
             # Connection already closed, ignore.
             pass
+
+
+class GameConnection:
+    """A player's or spectator's game socket.
+
+    Events go out in the format negotiated at connect time: "json" (the full
+    event, the default), "delta" (JSON without the FEN) or "msgpack" (delta
+    in binary frames). Every event carries the game's sequence number; when
+    one is skipped, or the numbering started over because Redis lost the
+    counter, a snapshot of the game is sent before the next event.
+    Players act with move, resign and draw frames, and any client can ask
+    for a snapshot with a sync frame. Frames are acknowledged under their id.
+
+    A client reconnecting with the last sequence number it saw gets exactly
+    the events it missed, replayed from the game's event log, or a snapshot
+    if the log no longer reaches back that far.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        game_id: int,
+        format: str,
+        last_event_id: int | None = None,
+    ):
+        self.websocket = websocket
+        self.game_id = game_id
+        self.format = format
+        self.last_seq = last_event_id
+
+    async def replay(self) -> list[Payload]:
+        if self.last_seq is None:
+            return []
+        events = await events_since(self.game_id, self.last_seq, redis_client)
+        if events is None:
+            try:
+                return [encode(await self.snapshot(), self.format)]
+            except HTTPException:
+                return []
+        payloads = []
+        for data in events:
+            self.last_seq, payload = encode_event(data, self.format)
+            payloads.append(payload)
+        return payloads
+
+    async def snapshot(self) -> dict:
+        async with SessionLocal() as db:
+            snapshot = await game_snapshot(self.game_id, db, redis_client)
+        if snapshot is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Game not found"
+            )
+        self.last_seq = snapshot["seq"]
+        return snapshot
+
+    async def on_message(self, data: str) -> list[Payload]:
+        seq, payload = encode_event(data, self.format)
+        if seq is None:
+            return [payload]
+        if self.last_seq is None or seq == self.last_seq + 1:
+            self.last_seq = seq
+            return [payload]
+        if seq <= self.last_seq:
+            # Already sent, unless the game's counter was lost and started over
+            counter = await current_seq(self.game_id, redis_client)
+            if counter is not None and counter >= self.last_seq:
+                return []
+        payloads = []
+        try:
+            payloads.append(encode(await self.snapshot(), self.format))
+        except HTTPException:
+            pass  # The game is gone; nothing to catch up on
+        if self.last_seq is None or seq > self.last_seq:
+            self.last_seq = seq
+            payloads.append(payload)
+        return payloads
+
+    # Play a move, resign or offer a draw as the player authenticated at
+    # connect time. The result is published to the game channel like the
+    # HTTP routes do and acknowledged to the sender.
+    async def _act(self, frame: GameFrame) -> MoveResponse:
+        player_id = self.websocket.state.user.id
+        moves = []
+        async with SessionLocal() as db:
+            if frame.type == "move":
+                if not frame.move:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST, detail="Missing move"
+                    )
+                game, moves = await validate_and_update_move_multiplayer(
+                    self.game_id, frame.move, player_id, db
+                )
+                publish_type = (
+                    RedisPublishType.TIMEOUT
+                    if timed_out(game)
+                    else RedisPublishType.MOVE
+                )
+            elif frame.type == "resign":
+                game = await resign_game_multiplayer(
+                    game_id=self.game_id, db=db, player_id=player_id
+                )
+                publish_type = RedisPublishType.RESIGN
+            else:
+                game, accepted = await offer_draw(
+                    game_id=self.game_id,
+                    db=db,
+                    player_id=player_id,
+                    redis_client=redis_client,
+                )
+                publish_type = (
+                    RedisPublishType.DRAW if accepted else RedisPublishType.DRAW_OFFER
+                )
+        await publish_redis(
+            game=game, type=publish_type, redis_client=redis_client, moves=moves
+        )
+        return MoveResponse(
+            fen=game.fen,
+            status=game.status,
+            winner=game.winner,
+            white_clock_ms=game.white_clock_ms,
+            black_clock_ms=game.black_clock_ms,
+        )
+
+    async def on_frame(self, data: Payload) -> Payload:
+        try:
+            frame = GameFrame.model_validate(decode(data))
+        except (ValueError, ValidationError):
+            ack = FrameAck(ok=False, status_code=400, detail="Invalid frame")
+            return encode(ack.model_dump(mode="json"), self.format)
+
+        try:
+            if frame.type == "sync":
+                return encode({**await self.snapshot(), "id": frame.id}, self.format)
+            ack = FrameAck(id=frame.id, ok=True, game=await self._act(frame))
+        except HTTPException as e:
+            ack = FrameAck(
+                id=frame.id, ok=False, status_code=e.status_code, detail=e.detail
+            )
+        except Exception as e:
+            print(f"Game frame for game {self.game_id} failed: {e}", flush=True)
+            ack = FrameAck(
+                id=frame.id, ok=False, status_code=500, detail="Internal error"
+            )
+        return encode(ack.model_dump(mode="json"), self.format)
+
+
+@router.websocket("/game/{game_id}")
+async def game_ws(
+    websocket: WebSocket,
+    game_id: int,
+    format: Literal["json", "delta", "msgpack"] = "json",
+    last_event_id: int | None = None,
+    access_token: str = Depends(verify_logged_in_user_ws),
+):
+    # Accept the connection and echo the token as the subprotocol.
+    await websocket.accept(subprotocol=access_token)
+    connection = GameConnection(websocket, game_id, format, last_event_id)
+    await relay_channel(
+        websocket,
+        f"game_{game_id}",
+        on_start=connection.replay,
+        on_message=connection.on_message,
+        on_frame=connection.on_frame,
+    )
+
+
+# Match notifications for the connected user (see /game/matchmaking/enqueue)
+@router.websocket("/matchmaking")
+async def matchmaking_ws(
+    websocket: WebSocket,
+    access_token: str = Depends(verify_logged_in_user_ws),
+):
+    await websocket.accept(subprotocol=access_token)
+    await relay_channel(websocket, f"user_{websocket.state.user.id}")
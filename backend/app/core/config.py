@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
 
@@ -29,6 +30,92 @@ class Settings(BaseSettings):
     # Stckfish Path
     STOCKFISH_PATH: str
 
+    # Stockfish engine pools (one per AI difficulty)
+    STOCKFISH_POOL_SIZE_EASY: int = 2
+    STOCKFISH_POOL_SIZE_MEDIUM: int = 1
+    STOCKFISH_POOL_SIZE_HARD: int = 1
+    STOCKFISH_THREADS: int = 1
+    STOCKFISH_HASH_MB: int = 16
+    STOCKFISH_POOL_TIMEOUT: float = 5.0
+    STOCKFISH_POOL_MAX_WAITERS: int = 32
+
+    # Stockfish supervision and load shedding
+    STOCKFISH_SEARCH_TIMEOUT: float = 10.0
+    STOCKFISH_HEALTHCHECK_INTERVAL: float = 10.0
+    STOCKFISH_PING_TIMEOUT: float = 2.0
+    STOCKFISH_SHED_WAITERS: int = 4
+    STOCKFISH_SHED_NODES: int = 20000
+    STOCKFISH_SHED_DEPTH: int = 8
+
+    # Engine backend: "local" pools in this process or "remote" engine workers
+    ENGINE_BACKEND: Literal["local", "remote"] = "local"
+    ENGINE_QUEUE_KEY: str = "engine:jobs"
+    ENGINE_REMOTE_TIMEOUT: float = 10.0
+
+    # Polyglot opening book (empty disables the book)
+    OPENING_BOOK_PATH: str = ""
+
+    # Syzygy endgame tablebases (empty disables probing)
+    SYZYGY_PATH: str = ""
+    SYZYGY_MAX_PIECES: int = 5
+
+    # AI reply cache (explore rate = chance a lookup is skipped to add variety;
+    # local entries are re-read from Redis after AI_CACHE_LOCAL_TTL_SECONDS)
+    AI_CACHE_LOCAL_SIZE: int = 10000
+    AI_CACHE_LOCAL_TTL_SECONDS: float = 60.0
+    AI_CACHE_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    AI_CACHE_MAX_CANDIDATES: int = 4
+    AI_CACHE_EXPLORE_RATE_EASY: float = 0.3
+    AI_CACHE_EXPLORE_RATE_MEDIUM: float = 0.1
+    AI_CACHE_EXPLORE_RATE_HARD: float = 0.0
+
+    # Pondering on the expected player reply during the player's think time
+    AI_PONDER_ENABLED: bool = False
+    AI_PONDER_MAX_SESSIONS: int = 4
+    AI_PONDER_RESULT_TTL: int = 300
+
+    # Hot game state for ongoing games (Redis, written behind to Postgres)
+    HOT_STATE_ENABLED: bool = False
+    HOT_STATE_LOCAL_SIZE: int = 10000
+    HOT_STATE_TTL_SECONDS: int = 24 * 60 * 60
+    HOT_STATE_FLUSH_INTERVAL: float = 1.0
+    HOT_STATE_FLUSH_BATCH: int = 500
+
+    # Positions whose legal move lists are cached per process
+    LEGAL_MOVES_CACHE_SIZE: int = 50000
+
+    # Game clocks: how often deadlines are checked and how many are claimed at once
+    CLOCK_TICK_SECONDS: float = 0.5
+    CLOCK_BATCH: int = 1000
+
+    # Reaper for stale games (WAITING without opponent, ONGOING without moves)
+    REAPER_ENABLED: bool = True
+    REAPER_INTERVAL_SECONDS: float = 60.0
+    REAPER_WAITING_TTL_SECONDS: int = 60 * 60
+    REAPER_ONGOING_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    REAPER_BATCH: int = 500
+
+    # Matchmaking (rating gap allowed at first and its growth per second waited)
+    MATCHMAKING_INTERVAL_SECONDS: float = 0.5
+    MATCHMAKING_BATCH: int = 1000
+    MATCHMAKING_SKILL_WINDOW: float = 100.0
+    MATCHMAKING_WINDOW_GROWTH: float = 10.0
+
+    # PGN uploads (parser processes shared by all uploads, games per parsed
+    # chunk, uploads at a time before new ones are turned away)
+    PGN_IMPORT_WORKERS: int = 2
+    PGN_IMPORT_BATCH: int = 500
+    PGN_IMPORT_MAX_UPLOADS: int = 2
+
+    # Messages buffered per WebSocket before a slow client is dropped
+    WS_QUEUE_SIZE: int = 256
+
+    # Per-game event log for replay on reconnect (events kept, and how long
+    # the log lives while the game runs and once it is over)
+    GAME_EVENTS_MAXLEN: int = 1000
+    GAME_EVENTS_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    GAME_EVENTS_FINISHED_TTL_SECONDS: int = 5 * 60
+
     # Cookie
     SECURE_COOKIE: bool = False
 
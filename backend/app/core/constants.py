@@ -10,6 +10,7 @@ class GameStatus(str, Enum):
 class GameType(str, Enum):
     MULTIPLAYER = "multiplayer"
     AI = "ai"
+    IMPORTED = "imported"  # Uploaded from PGN, never rated
 
 
 class Winner(str, Enum):
@@ -26,7 +27,62 @@ class AIDifficulty(str, Enum):
     HARD = "hard"
 
 
+# Stockfish "Skill Level" each difficulty's engines are pinned to
+AI_SKILL_LEVELS = {
+    AIDifficulty.EASY: 5,
+    AIDifficulty.MEDIUM: 12,
+    AIDifficulty.HARD: 20,
+}
+
+# Elo ratings: new players start at RATING_INITIAL, the K-factor drops once a
+# player has RATING_PROVISIONAL_GAMES rated games, and AI opponents have a
+# fixed rating per difficulty
+RATING_INITIAL = 1500.0
+RATING_K_PROVISIONAL = 40
+RATING_K = 20
+RATING_PROVISIONAL_GAMES = 30
+AI_RATINGS = {
+    AIDifficulty.EASY: 1000.0,
+    AIDifficulty.MEDIUM: 1600.0,
+    AIDifficulty.HARD: 2300.0,
+}
+
+
+# Search budget per difficulty. Node and depth caps keep strength (and CPU)
+# independent of machine load, movetime is the wall-clock ceiling. With
+# multipv > 1 the reply is picked at random among the engine's top lines that
+# are within margin centipawns of the best one.
+AI_SEARCH_PROFILES = {
+    AIDifficulty.EASY: {
+        "nodes": 2000,
+        "depth": 6,
+        "movetime": 0.05,
+        "multipv": 4,
+        "margin": 200,
+    },
+    AIDifficulty.MEDIUM: {
+        "nodes": 50000,
+        "depth": 12,
+        "movetime": 0.2,
+        "multipv": 2,
+        "margin": 60,
+    },
+    AIDifficulty.HARD: {
+        "nodes": None,
+        "depth": None,
+        "movetime": 0.5,
+        "multipv": 1,
+        "margin": 0,
+    },
+}
+
+
 class RedisPublishType(str, Enum):
     MOVE = "move"
     RESIGN = "resign"
     JOIN = "join"
+    TIMEOUT = "timeout"
+    MATCH = "match"
+    DRAW_OFFER = "draw_offer"
+    DRAW = "draw"  # Draw offer accepted
+    AI_ERROR = "ai_error"  # The AI reply could not be computed
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import random
+import time
+import uuid
+import chess
+import chess.engine
+from fastapi import HTTPException, status
+from redis.asyncio import Redis, RedisError
+from app.core.constants import AI_SEARCH_PROFILES, AIDifficulty
+from app.core.engine_pool import EnginePool
+from app.core.metrics import LatencyStats
+
+MATE_SCORE = 100000
+
+
+def profile_limit(profile: dict) -> chess.engine.Limit:
+    return chess.engine.Limit(
+        time=profile["movetime"], depth=profile["depth"], nodes=profile["nodes"]
+    )
+
+
+# Run one search for a difficulty profile. Single-PV profiles let the engine
+# pick (Skill Level applies); multi-PV profiles pick among the top lines.
+async def run_search(
+    engine: chess.engine.UciProtocol,
+    board: chess.Board,
+    limit: chess.engine.Limit,
+    profile: dict,
+) -> chess.engine.PlayResult:
+    if profile["multipv"] <= 1:
+        return await engine.play(board, limit)
+
+    infos = await engine.analyse(board, limit, multipv=profile["multipv"])
+    lines = [
+        (info["score"].relative.score(mate_score=MATE_SCORE), info["pv"])
+        for info in infos
+        if info.get("pv") and "score" in info
+    ]
+    if not lines:
+        return await engine.play(board, limit)
+    best_score = max(score for score, _ in lines)
+    _, pv = random.choice(
+        [line for line in lines if best_score - line[0] <= profile["margin"]]
+    )
+    return chess.engine.PlayResult(pv[0], pv[1] if len(pv) > 1 else None)
+
+
+# Each difficulty has its own job list, so a worker only takes jobs its
+# matching pool has an engine free for
+def engine_queue_key(queue_key: str, difficulty: AIDifficulty) -> str:
+    return f"{queue_key}:{difficulty.value}"
+
+
+def latency_by_difficulty() -> dict[AIDifficulty, LatencyStats]:
+    return {difficulty: LatencyStats() for difficulty in AIDifficulty}
+
+
+class LocalEngineBackend:
+    """Searches with the engine pools running inside this process."""
+
+    def __init__(
+        self, engine_pools: dict[AIDifficulty, EnginePool], search_timeout: float
+    ):
+        self.engine_pools = engine_pools
+        self.search_timeout = search_timeout
+        self.latency = latency_by_difficulty()
+
+    async def play(
+        self, board: chess.Board, difficulty: AIDifficulty
+    ) -> chess.engine.PlayResult:
+        engine_pool = self.engine_pools[difficulty]
+        profile = AI_SEARCH_PROFILES[difficulty]
+        async with engine_pool.checkout() as engine:
+            limit = profile_limit(profile)
+            search_limit = engine_pool.search_limit(limit)
+            with self.latency[difficulty].timer():
+                result = await asyncio.wait_for(
+                    run_search(engine, board, search_limit, profile),
+                    timeout=self.search_timeout,
+                )
+        # Searches cut down under load are flagged so their reply is not cached
+        result.info["shed"] = search_limit is not limit
+        return result
+
+    def stats(self) -> dict:
+        return {
+            difficulty: latency.stats() for difficulty, latency in self.latency.items()
+        }
+
+
+class RemoteEngineBackend:
+    """Sends searches to engine workers (app.workers.engine) through Redis.
+
+    Jobs are pushed onto a Redis list per difficulty shared by all workers;
+    each job names a private reply list that the caller blocks on until the worker answers.
+    """
+
+    def __init__(self, redis: Redis, queue_key: str, timeout: float):
+        self.redis = redis
+        self.queue_key = queue_key
+        self.timeout = timeout
+        self.latency = latency_by_difficulty()
+
+    async def play(
+        self, board: chess.Board, difficulty: AIDifficulty
+    ) -> chess.engine.PlayResult:
+        with self.latency[difficulty].timer():
+            return await self._play(board, difficulty)
+
+    async def _play(
+        self, board: chess.Board, difficulty: AIDifficulty
+    ) -> chess.engine.PlayResult:
+        job_id = str(uuid.uuid4())
+        reply_to = f"{self.queue_key}:reply:{job_id}"
+        job = {
+            "id": job_id,
+            "fen": board.fen(),
+            "difficulty": difficulty.value,
+            "reply_to": reply_to,
+            "deadline": time.time() + self.timeout,
+        }
+        try:
+            await self.redis.rpush(
+                engine_queue_key(self.queue_key, difficulty), json.dumps(job)
+            )
+            item = await self.redis.blpop(reply_to, timeout=self.timeout)
+        except RedisError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="AI engine service is unavailable",
+            )
+        if item is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Timed out waiting for the AI engine service",
+            )
+
+        reply = json.loads(item[1])
+        if "error" in reply:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=reply["error"]
+            )
+        ponder = reply.get("ponder")
+        return chess.engine.PlayResult(
+            chess.Move.from_uci(reply["move"]),
+            chess.Move.from_uci(ponder) if ponder else None,
+            {"shed": reply.get("shed", False)},
+        )
+
+    def stats(self) -> dict:
+        return {
+            difficulty: latency.stats() for difficulty, latency in self.latency.items()
+        }
@@ -0,0 +1,251 @@
+import asyncio
+from contextlib import asynccontextmanager
+import chess.engine
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.core.constants import AI_SKILL_LEVELS, AIDifficulty
+
+ENGINE_ERRORS = (
+    chess.engine.EngineError,
+    chess.engine.EngineTerminatedError,
+    asyncio.TimeoutError,
+)
+
+
+class EnginePool:
+    """A fixed set of Stockfish processes handed out one request at a time.
+
+    Engines that crash, error or time out while checked out are killed and
+    replaced. Once `shed_waiters` requests are queued, search_limit() trades
+    the wall-clock budget for a fixed node/depth budget so latency degrades
+    gracefully instead of the queue growing.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        threads: int = 1,
+        hash_mb: int = 16,
+        timeout: float = 5.0,
+        max_waiters: int = 32,
+        options: dict | None = None,
+        shed_waiters: int = 4,
+        shed_nodes: int = 20000,
+        shed_depth: int = 8,
+    ):
+        self.path = path
+        self.size = size
+        self.options = options or {}
+        self.threads = threads
+        self.hash_mb = hash_mb
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.shed_waiters = shed_waiters
+        self.shed_nodes = shed_nodes
+        self.shed_depth = shed_depth
+        self.counters = {"restarts": 0, "rejected": 0, "shed": 0}
+        self._engines: list[chess.engine.UciProtocol] = []
+        self._idle: asyncio.Queue[chess.engine.UciProtocol] = asyncio.Queue()
+        self._waiters = 0
+        self._top_up_lock = asyncio.Lock()
+
+    # Spawn a single UCI process with the per-process settings applied
+    async def _spawn(self) -> chess.engine.UciProtocol:
+        _, engine = await chess.engine.popen_uci(self.path)
+        await engine.configure(
+            {"Threads": self.threads, "Hash": self.hash_mb, **self.options}
+        )
+        return engine
+
+    async def start(self):
+        for _ in range(self.size):
+            engine = await self._spawn()
+            self._engines.append(engine)
+            self._idle.put_nowait(engine)
+
+    # Spawn engines until the pool is back to its configured size; one caller
+    # at a time, or concurrent replacements would overshoot it
+    async def _top_up(self):
+        async with self._top_up_lock:
+            while len(self._engines) < self.size:
+                try:
+                    engine = await self._spawn()
+                except (OSError, *ENGINE_ERRORS) as e:
+                    print(f"Failed to start engine: {e}", flush=True)
+                    return
+                self._engines.append(engine)
+                self._idle.put_nowait(engine)
+                self.counters["restarts"] += 1
+
+    # Kill a crashed or hung engine and start a fresh one in its place
+    async def replace(self, engine: chess.engine.UciProtocol):
+        if engine in self._engines:
+            self._engines.remove(engine)
+        try:
+            engine.transport.kill()
+        except (AttributeError, ProcessLookupError):
+            pass
+        await self._top_up()
+
+    # Ping idle engines with isready and replace the ones that do not answer
+    async def health_check(self, timeout: float):
+        for _ in range(self._idle.qsize()):
+            try:
+                engine = self._idle.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            try:
+                await asyncio.wait_for(engine.ping(), timeout=timeout)
+            except ENGINE_ERRORS:
+                await self.replace(engine)
+            else:
+                self.release(engine)
+        await self._top_up()
+
+    async def close(self):
+        for engine in self._engines:
+            try:
+                await engine.quit()
+            except (chess.engine.EngineError, chess.engine.EngineTerminatedError):
+                pass
+        self._engines.clear()
+
+    @property
+    def idle(self) -> int:
+        return self._idle.qsize()
+
+    @property
+    def waiters(self) -> int:
+        return self._waiters
+
+    # Borrow an engine for the duration of the block and return it afterwards
+    @asynccontextmanager
+    async def checkout(self):
+        if self._idle.empty() and self._waiters >= self.max_waiters:
+            self.counters["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="AI engine is busy, try again later",
+            )
+        self._waiters += 1
+        try:
+            engine = await asyncio.wait_for(self._idle.get(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.counters["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Timed out waiting for an AI engine",
+            )
+        finally:
+            self._waiters -= 1
+        try:
+            yield engine
+        except ENGINE_ERRORS:
+            await self.replace(engine)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="AI engine failed, try again",
+            )
+        except BaseException:
+            self.release(engine)
+            raise
+        else:
+            self.release(engine)
+
+    # Take an idle engine without waiting, but only while more than `reserve`
+    # engines stay idle for regular searches; pair with release()
+    def try_acquire(self, reserve: int = 1) -> chess.engine.UciProtocol | None:
+        if self._waiters or self._idle.qsize() <= reserve:
+            return None
+        return self._idle.get_nowait()
+
+    def release(self, engine: chess.engine.UciProtocol):
+        self._idle.put_nowait(engine)
+
+    # Cheaper fixed-size search while requests are queueing for this pool
+    def search_limit(self, limit: chess.engine.Limit) -> chess.engine.Limit:
+        if self._waiters < self.shed_waiters:
+            return limit
+        self.counters["shed"] += 1
+        return chess.engine.Limit(
+            nodes=min(limit.nodes or self.shed_nodes, self.shed_nodes),
+            depth=min(limit.depth or self.shed_depth, self.shed_depth),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "alive": len(self._engines),
+            "idle": self.idle,
+            "waiters": self.waiters,
+            **self.counters,
+        }
+
+
+class EngineSupervisor:
+    """Periodically health-checks every pool and restores crashed engines."""
+
+    def __init__(
+        self,
+        engine_pools: dict[AIDifficulty, EnginePool],
+        interval: float,
+        ping_timeout: float,
+    ):
+        self.engine_pools = engine_pools
+        self.interval = interval
+        self.ping_timeout = ping_timeout
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            for difficulty, engine_pool in self.engine_pools.items():
+                try:
+                    await engine_pool.health_check(self.ping_timeout)
+                except Exception as e:
+                    print(f"Engine health check failed ({difficulty}): {e}", flush=True)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+POOL_SIZES = {
+    AIDifficulty.EASY: settings.STOCKFISH_POOL_SIZE_EASY,
+    AIDifficulty.MEDIUM: settings.STOCKFISH_POOL_SIZE_MEDIUM,
+    AIDifficulty.HARD: settings.STOCKFISH_POOL_SIZE_HARD,
+}
+
+
+# Start one pool per difficulty, each pinned to its skill level at spawn time
+async def start_engine_pools() -> dict[AIDifficulty, EnginePool]:
+    engine_pools = {}
+    for difficulty, skill_level in AI_SKILL_LEVELS.items():
+        engine_pool = EnginePool(
+            path=settings.STOCKFISH_PATH,
+            size=POOL_SIZES[difficulty],
+            threads=settings.STOCKFISH_THREADS,
+            hash_mb=settings.STOCKFISH_HASH_MB,
+            timeout=settings.STOCKFISH_POOL_TIMEOUT,
+            max_waiters=settings.STOCKFISH_POOL_MAX_WAITERS,
+            options={"Skill Level": skill_level},
+            shed_waiters=settings.STOCKFISH_SHED_WAITERS,
+            shed_nodes=settings.STOCKFISH_SHED_NODES,
+            shed_depth=settings.STOCKFISH_SHED_DEPTH,
+        )
+        await engine_pool.start()
+        engine_pools[difficulty] = engine_pool
+    return engine_pools
+
+
+async def close_engine_pools(engine_pools: dict[AIDifficulty, EnginePool]):
+    for engine_pool in engine_pools.values():
+        await engine_pool.close()
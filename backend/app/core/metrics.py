@@ -0,0 +1,47 @@
+import time
+from collections import deque
+
+
+class LatencyStats:
+    """Rolling latency window (last `window` samples) reported in milliseconds."""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self._samples.append(seconds * 1000)
+
+    # Time the enclosed block: `with stats.timer(): ...`
+    def timer(self):
+        return _Timer(self)
+
+    def stats(self) -> dict:
+        if not self._samples:
+            return {"count": self.count}
+        samples = sorted(self._samples)
+
+        def percentile(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 2)
+
+        return {
+            "count": self.count,
+            "avg_ms": round(sum(samples) / len(samples), 2),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1], 2),
+        }
+
+
+class _Timer:
+    def __init__(self, latency: LatencyStats):
+        self.latency = latency
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.latency.observe(time.perf_counter() - self.started_at)
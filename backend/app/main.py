@@ -1,28 +1,84 @@
 from contextlib import asynccontextmanager
-import chess
-import chess.engine
-from fastapi import FastAPI, HTTPException, Request
+from functools import partial
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.api.v1.endpoints import auth, users, game, ws
 from app.core.config import settings
+from app.core.engine_backend import LocalEngineBackend, RemoteEngineBackend
+from app.core.engine_pool import (
+    EngineSupervisor,
+    close_engine_pools,
+    start_engine_pools,
+)
 from app.core.redis_client import redis_client, is_redis_available
 from app.middlewares.logger import LoggingMiddleware
+from app.models.user import User
+from app.services.ai_cache import ai_reply_cache
+from app.services.auth import get_current_active_user
+from app.services.clock import game_clock
+from app.services.game import (
+    close_opening_book,
+    close_tablebase,
+    flag_game,
+    open_opening_book,
+    open_tablebase,
+)
+from app.services.game_state import game_state_store
+from app.services.matchmaking import matchmaker
+from app.services.pgn_import import pgn_uploads
+from app.services.ponder import ponderer
+from app.services.pubsub_hub import pubsub_hub
+from app.services.reaper import game_reaper
+from app.services.rules import legal_moves_stats
 
 FRONTEND_URLS = settings.FRONTEND_URLS
-STOCKFISH_PATH = settings.STOCKFISH_PATH
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await is_redis_available()
-    transport, engine = await chess.engine.popen_uci(STOCKFISH_PATH)
-    app.state.engine = engine
+    if settings.ENGINE_BACKEND == "remote":
+        app.state.engine_pools = {}
+        app.state.engine_backend = RemoteEngineBackend(
+            redis=redis_client,
+            queue_key=settings.ENGINE_QUEUE_KEY,
+            timeout=settings.ENGINE_REMOTE_TIMEOUT,
+        )
+    else:
+        app.state.engine_pools = await start_engine_pools()
+        app.state.engine_backend = LocalEngineBackend(
+            engine_pools=app.state.engine_pools,
+            search_timeout=settings.STOCKFISH_SEARCH_TIMEOUT,
+        )
+    engine_supervisor = EngineSupervisor(
+        engine_pools=app.state.engine_pools,
+        interval=settings.STOCKFISH_HEALTHCHECK_INTERVAL,
+        ping_timeout=settings.STOCKFISH_PING_TIMEOUT,
+    )
+    engine_supervisor.start()
+    app.state.opening_book = open_opening_book(settings.OPENING_BOOK_PATH)
+    app.state.tablebase = open_tablebase(settings.SYZYGY_PATH)
+    await game_state_store.start()
+    game_clock.start(on_flag=partial(flag_game, redis_client=redis_client))
+    game_reaper.start()
+    matchmaker.start()
+    await pubsub_hub.start()
     try:
         yield
     finally:
+        await pubsub_hub.close()
+        pgn_uploads.close()
+        await matchmaker.close()
+        await game_reaper.close()
+        await game_clock.close()
+        await game_state_store.close()
         await redis_client.close()
-        await engine.quit()
+        await ponderer.close()
+        await engine_supervisor.close()
+        await close_engine_pools(app.state.engine_pools)
+        close_opening_book(app.state.opening_book)
+        close_tablebase(app.state.tablebase)
 
 
 app = FastAPI(lifespan=lifespan)
@@ -55,6 +111,29 @@ async def healthcheck():
     return {"message": "API Working"}
 
 
+# Runtime counters route, for signed-in users only
+@app.get("/stats", tags=["healthcheck"])
+async def stats(
+    request: Request, current_user: User = Depends(get_current_active_user)
+):
+    return {
+        "engines": {
+            difficulty: engine_pool.stats()
+            for difficulty, engine_pool in request.app.state.engine_pools.items()
+        },
+        "search_latency": request.app.state.engine_backend.stats(),
+        "ai_cache": ai_reply_cache.stats(),
+        "ai_ponder": ponderer.stats(),
+        "game_state": game_state_store.stats(),
+        "legal_moves": legal_moves_stats(),
+        "game_clock": game_clock.stats(),
+        "reaper": game_reaper.stats(),
+        "matchmaking": matchmaker.stats(),
+        "pubsub_hub": pubsub_hub.stats(),
+        "pgn_uploads": pgn_uploads.stats(),
+    }
+
+
 # Exception handler example
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -1,5 +1,15 @@
 import uuid
-from sqlalchemy import TIMESTAMP, Column, ForeignKey, Enum, Integer, String
+from sqlalchemy import (
+    TIMESTAMP,
+    BigInteger,
+    Column,
+    ForeignKey,
+    Enum,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+)
 from sqlalchemy.sql import func
 from app.core.database import Base
 from app.core.constants import AIDifficulty, GameStatus, GameType, Winner
@@ -7,9 +17,17 @@ from app.core.constants import AIDifficulty, GameStatus, GameType, Winner
 
 class Game(Base):
     __tablename__ = "games"
+    __table_args__ = (
+        # Lets the reaper find stale games without scanning the table
+        Index("ix_games_status_updated_at", "status", "updated_at"),
+        # A player's games by date, for exports
+        Index("ix_games_white_created_at", "player_white_id", "created_at"),
+        Index("ix_games_black_created_at", "player_black_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
-    player_white_id = Column(String(36), ForeignKey("users.id"), nullable=False)
+    # Imported games may have players without an account here
+    player_white_id = Column(String(36), ForeignKey("users.id"), nullable=True)
     player_black_id = Column(String(36), ForeignKey("users.id"), nullable=True)
 
     game_type = Column(Enum(GameType), default=GameType.MULTIPLAYER)
@@ -18,6 +36,17 @@ class Game(Base):
     fen = Column(String, default="startpos")  # Use FEN notation for board state
     status = Column(Enum(GameStatus), default=GameStatus.WAITING)
     winner = Column(Enum(Winner), default=Winner.ONGOING)
+    # Position hashes since the last capture or pawn move, for repetition checks
+    repetition_keys = Column(LargeBinary, nullable=True)
+    # Time control in seconds (no base = untimed) and the remaining clocks; the
+    # clock of the side to move has been running since clock_started_at (epoch ms)
+    time_base = Column(Integer, nullable=True)
+    time_increment = Column(Integer, nullable=False, default=0, server_default="0")
+    white_clock_ms = Column(Integer, nullable=True)
+    black_clock_ms = Column(Integer, nullable=True)
+    clock_started_at = Column(BigInteger, nullable=True)
+    # Bumped on every write; updates are conditional on the version read
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, ForeignKey, Integer, SmallInteger
+from app.core.database import Base
+
+
+class GameMove(Base):
+    __tablename__ = "game_moves"
+
+    game_id = Column(Integer, ForeignKey("games.id"), primary_key=True)
+    ply = Column(Integer, primary_key=True)  # 0 = White's first move
+    move = Column(SmallInteger, nullable=False)  # from | to << 6 | promotion << 12
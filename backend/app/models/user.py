@@ -1,7 +1,8 @@
 import uuid
-from sqlalchemy import TIMESTAMP, Boolean, Column, String, Text
+from sqlalchemy import TIMESTAMP, Boolean, Column, Float, Integer, String, Text
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.core.constants import RATING_INITIAL
 
 
 class User(Base):
@@ -18,4 +19,9 @@ class User(Base):
     refresh_token = Column(Text, nullable=True)
 
     is_active = Column(Boolean(), default=True)
+    # Elo rating, updated when each rated game finishes
+    rating = Column(
+        Float, nullable=False, default=RATING_INITIAL, server_default="1500"
+    )
+    rated_games = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(TIMESTAMP, server_default=func.now())
@@ -7,6 +7,7 @@ class UserResponse(BaseModel):
     username: str
     email: str
     is_active: bool
+    rating: float
     created_at: datetime
 
 
@@ -1,5 +1,6 @@
 from datetime import datetime
-from pydantic import BaseModel
+from typing import Literal
+from pydantic import BaseModel, Field
 from app.core.constants import AIDifficulty, GameStatus, GameType, Winner
 
 
@@ -10,9 +11,21 @@ class GameResponse(BaseModel):
     fen: str
     status: GameStatus
     game_type: GameType
+    time_base: int | None = None
+    time_increment: int = 0
     created_at: datetime
 
 
+class GameCreateRequest(BaseModel):
+    # Seconds per player and seconds added per move; no base means untimed
+    time_base: int | None = Field(default=None, gt=0, le=3 * 60 * 60)
+    time_increment: int = Field(default=0, ge=0, le=60)
+
+
+class MatchmakingResponse(BaseModel):
+    pool: str
+
+
 class GameAIRequest(BaseModel):
     ai_difficulty: AIDifficulty
 
@@ -36,7 +49,40 @@ class MoveRequest(BaseModel):
     move: str
 
 
+class AIMoveRequest(MoveRequest):
+    # Reply right after the player's move; the AI move follows over the WebSocket
+    async_reply: bool = False
+
+
 class MoveResponse(BaseModel):
     fen: str
     status: GameStatus
     winner: Winner
+    white_clock_ms: int | None = None
+    black_clock_ms: int | None = None
+
+
+class LegalMovesResponse(BaseModel):
+    fen: str
+    moves: list[str]  # UCI, e.g. "e2e4" or "e7e8q"
+
+
+class DrawOfferResponse(MoveResponse):
+    accepted: bool  # False while the offer waits for the opponent
+
+
+# Sent over the game WebSocket: a player's action, or a request for a
+# snapshot ("sync"); `id` is echoed in the reply
+class GameFrame(BaseModel):
+    id: str | int | None = None
+    type: Literal["move", "resign", "draw", "sync"]
+    move: str | None = None
+
+
+class FrameAck(BaseModel):
+    type: Literal["ack"] = "ack"
+    id: str | int | None = None
+    ok: bool
+    status_code: int = 200
+    detail: str | None = None
+    game: MoveResponse | None = None
@@ -17,6 +17,14 @@ class UserStatsResponse(BaseModel):
     ai_win_rate: str
 
 
+class PgnImportResponse(BaseModel):
+    imported: int
+    skipped: int
+    moves: int
+    seconds: float
+    rows_per_second: float
+
+
 class RecentGameResponse(BaseModel):
     opponent_username: str
     opponent_id: Optional[str]
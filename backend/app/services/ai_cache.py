@@ -0,0 +1,130 @@
+import random
+import time
+from collections import OrderedDict
+import chess
+from redis.asyncio import Redis, RedisError
+from app.core.config import settings
+from app.core.constants import AIDifficulty
+from app.core.redis_client import redis_client
+
+# Add a reply unless the position already has enough of them, refresh the TTL
+# and return the candidates, in one step so concurrent puts cannot overfill it
+PUT_SCRIPT = """
+if redis.call('SCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('SADD', KEYS[1], ARGV[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return redis.call('SMEMBERS', KEYS[1])
+"""
+
+
+class AIReplyCache:
+    """Two-tier (in-process LRU + Redis) cache of AI replies per position.
+
+    Each entry keeps up to `max_candidates` distinct replies. A lookup is
+    treated as a miss with the difficulty's explore rate, so the engine is
+    consulted again and its answer joins the candidate set; hits return a
+    random candidate. This keeps weakened difficulties from replaying the
+    exact same game every time.
+
+    Local entries are re-read from Redis once they are `local_ttl` seconds
+    old, so replies other processes add reach this one too.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        local_size: int,
+        local_ttl: float,
+        ttl: int,
+        max_candidates: int,
+        explore_rates: dict[AIDifficulty, float],
+    ):
+        self.redis = redis
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        self.max_candidates = max_candidates
+        self.explore_rates = explore_rates
+        # Candidates per position and when they were read from Redis
+        self._local: OrderedDict[str, tuple[list[str], float]] = OrderedDict()
+        self._put = redis.register_script(PUT_SCRIPT)
+        self.counters = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "explored": 0,
+        }
+
+    # Position key without the move clocks, so transpositions share entries
+    @staticmethod
+    def _key(board: chess.Board, difficulty: AIDifficulty) -> str:
+        return f"ai_move:{difficulty.value}:{board.epd()}"
+
+    def _remember(self, key: str, moves: list[str]):
+        self._local[key] = (moves, time.monotonic())
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def get(
+        self, board: chess.Board, difficulty: AIDifficulty
+    ) -> chess.Move | None:
+        if random.random() < self.explore_rates.get(difficulty, 0.0):
+            self.counters["explored"] += 1
+            return None
+
+        key = self._key(board, difficulty)
+        moves, read_at = self._local.get(key, ((), 0.0))
+        if moves and time.monotonic() - read_at < self.local_ttl:
+            self._local.move_to_end(key)
+            self.counters["local_hits"] += 1
+        else:
+            try:
+                moves = list(await self.redis.smembers(key))
+            except RedisError:
+                moves = []
+            if not moves:
+                self.counters["misses"] += 1
+                return None
+            self._remember(key, moves)
+            self.counters["redis_hits"] += 1
+
+        move = chess.Move.from_uci(random.choice(moves))
+        return move if board.is_legal(move) else None
+
+    async def put(self, board: chess.Board, difficulty: AIDifficulty, move: chess.Move):
+        key = self._key(board, difficulty)
+        try:
+            moves = await self._put(
+                keys=[key], args=[move.uci(), self.max_candidates, self.ttl]
+            )
+        except RedisError:
+            moves, _ = self._local.get(key, ([], 0.0))
+            if move.uci() in moves or len(moves) >= self.max_candidates:
+                return
+            moves = moves + [move.uci()]
+        self._remember(key, list(moves))
+
+    def stats(self) -> dict:
+        lookups = sum(self.counters.values())
+        hits = self.counters["local_hits"] + self.counters["redis_hits"]
+        return {
+            **self.counters,
+            "local_entries": len(self._local),
+            "hit_rate": f"{(hits / lookups * 100):.2f}%" if lookups else "0%",
+        }
+
+
+ai_reply_cache = AIReplyCache(
+    redis=redis_client,
+    local_size=settings.AI_CACHE_LOCAL_SIZE,
+    local_ttl=settings.AI_CACHE_LOCAL_TTL_SECONDS,
+    ttl=settings.AI_CACHE_TTL_SECONDS,
+    max_candidates=settings.AI_CACHE_MAX_CANDIDATES,
+    explore_rates={
+        AIDifficulty.EASY: settings.AI_CACHE_EXPLORE_RATE_EASY,
+        AIDifficulty.MEDIUM: settings.AI_CACHE_EXPLORE_RATE_MEDIUM,
+        AIDifficulty.HARD: settings.AI_CACHE_EXPLORE_RATE_HARD,
+    },
+)
@@ -316,4 +316,5 @@ async def verify_logged_in_user_ws(
     db_user = result.scalars().first()
     if db_user is None:
         await credentials_exception()
+    websocket.state.user = db_user
     return access_token
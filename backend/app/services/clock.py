@@ -0,0 +1,169 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+import chess
+from redis.asyncio import Redis
+from app.core.config import settings
+from app.core.constants import GameStatus, GameType, Winner
+from app.core.redis_client import redis_client
+
+DEADLINES_KEY = "game_clock:deadlines"
+
+# Claim the games whose deadline has passed and drop them from the set in one
+# step, so each flag-fall is handled by exactly one instance
+CLAIM_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+end
+return due
+"""
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def is_timed(game) -> bool:
+    return game.time_base is not None and game.clock_started_at is not None
+
+
+def side_to_move(game) -> chess.Color:
+    return game.fen == "startpos" or game.fen.split()[1] == "w"
+
+
+# Epoch ms at which the running clock of the side to move hits zero
+def deadline(game) -> int:
+    if side_to_move(game) == chess.WHITE:
+        return game.clock_started_at + game.white_clock_ms
+    return game.clock_started_at + game.black_clock_ms
+
+
+def flag_fell(game) -> bool:
+    return (
+        is_timed(game)
+        and game.status == GameStatus.ONGOING
+        and now_ms() >= deadline(game)
+    )
+
+
+# A clock only reaches zero when its flag falls
+def timed_out(game) -> bool:
+    return game.status == GameStatus.FINISHED and 0 in (
+        game.white_clock_ms,
+        game.black_clock_ms,
+    )
+
+
+# Finish the game on time: the side to move loses, unless the opponent could
+# never mate, in which case it is a draw
+def finish_on_time(game, board: chess.Board):
+    if board.turn == chess.WHITE:
+        game.white_clock_ms = 0
+    else:
+        game.black_clock_ms = 0
+    game.status = GameStatus.FINISHED
+    opponent = not board.turn
+    if board.has_insufficient_material(opponent):
+        game.winner = Winner.DRAW
+    elif opponent == chess.WHITE:
+        game.winner = Winner.WHITE
+    else:
+        game.winner = Winner.AI if game.game_type == GameType.AI else Winner.BLACK
+
+
+# Stop the mover's clock, add the increment and start the opponent's clock.
+# Returns False (and finishes the game on time) if the flag already fell.
+def press_clock(game, board: chess.Board) -> bool:
+    if not is_timed(game):
+        return True
+    now = now_ms()
+    elapsed = now - game.clock_started_at
+    increment = game.time_increment * 1000
+    if board.turn == chess.WHITE:
+        remaining = game.white_clock_ms - elapsed
+        if remaining > 0:
+            game.white_clock_ms = remaining + increment
+    else:
+        remaining = game.black_clock_ms - elapsed
+        if remaining > 0:
+            game.black_clock_ms = remaining + increment
+    if remaining <= 0:
+        finish_on_time(game, board)
+        return False
+    game.clock_started_at = now
+    return True
+
+
+class GameClock:
+    """Flag-fall detection for every timed game with a single task.
+
+    The deadline of each running clock is kept in one Redis sorted set that
+    all instances share. Every tick, each process atomically claims the
+    deadlines that have passed and hands them to the flag handler, so the cost
+    is one round trip per tick however many games are running.
+    """
+
+    def __init__(self, redis: Redis, tick: float, batch: int):
+        self.redis = redis
+        self.tick = tick
+        self.batch = batch
+        self._claim = redis.register_script(CLAIM_SCRIPT)
+        self._on_flag: Callable[[int], Awaitable[None]] | None = None
+        self._task: asyncio.Task | None = None
+        self.counters = {"claimed": 0, "failed": 0}
+
+    # Track the game's current deadline, or stop tracking it once it is over
+    async def schedule(self, game):
+        if not is_timed(game):
+            return
+        if game.status == GameStatus.ONGOING:
+            await self.redis.zadd(DEADLINES_KEY, {str(game.id): deadline(game)})
+        else:
+            await self.redis.zrem(DEADLINES_KEY, str(game.id))
+
+    # Handle one batch of due deadlines; returns how many were claimed
+    async def poll(self) -> int:
+        due = await self._claim(keys=[DEADLINES_KEY], args=[now_ms(), self.batch])
+        self.counters["claimed"] += len(due)
+        for game_id in due:
+            try:
+                await self._on_flag(int(game_id))
+            except Exception as e:
+                self.counters["failed"] += 1
+                print(f"Clock check for game {game_id} failed: {e}", flush=True)
+                # Retry on the next tick
+                await self.redis.zadd(DEADLINES_KEY, {game_id: now_ms()})
+        return len(due)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                while await self.poll() == self.batch:
+                    pass
+            except Exception as e:
+                print(f"Game clock poll failed: {e}", flush=True)
+
+    def start(self, on_flag: Callable[[int], Awaitable[None]]):
+        self._on_flag = on_flag
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self) -> dict:
+        return dict(self.counters)
+
+
+game_clock = GameClock(
+    redis=redis_client,
+    tick=settings.CLOCK_TICK_SECONDS,
+    batch=settings.CLOCK_BATCH,
+)
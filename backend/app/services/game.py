@@ -1,10 +1,16 @@
-import chess.engine
-from fastapi import HTTPException, Request, status
+import asyncio
+import os
+import random
+import chess.polyglot
+import chess.syzygy
+from fastapi import FastAPI, HTTPException, Request, status
 from redis.asyncio import Redis
+from sqlalchemy import update
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.game import Game
 from app.core.constants import (
+    AI_SEARCH_PROFILES,
     AIDifficulty,
     GameStatus,
     GameType,
@@ -12,16 +18,105 @@ from app.core.constants import (
     Winner,
 )
 from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.ai_cache import ai_reply_cache
+from app.services.game_events import publish_event
+from app.services.clock import (
+    finish_on_time,
+    flag_fell,
+    game_clock,
+    now_ms,
+    press_clock,
+)
+from app.services.game_state import (
+    HotGame,
+    game_board,
+    get_game,
+    load_game,
+    save_game,
+)
+from app.services.move_history import push_move
+from app.services.ponder import ponderer
+from app.services.rules import finish_if_over, legal_moves, parse_move
 import chess
-import json
 
 
 STOCKFISH_PATH = settings.STOCKFISH_PATH
+SYZYGY_MAX_PIECES = settings.SYZYGY_MAX_PIECES
+AI_REPLY_ATTEMPTS = 3
+AI_REPLY_CLAIM_SECONDS = 60
+DRAW_OFFER_TTL_SECONDS = 24 * 60 * 60
 
 
+# Open the polyglot book once (memory-mapped), or None if no book is configured
+def open_opening_book(path: str) -> chess.polyglot.MemoryMappedReader | None:
+    if not path:
+        return None
+    try:
+        return chess.polyglot.open_reader(path)
+    except OSError as e:
+        print(f"Opening book not loaded: {e}", flush=True)
+        return None
+
+
+def close_opening_book(book: chess.polyglot.MemoryMappedReader | None):
+    if book is not None:
+        book.close()
+
+
+# Pick a book reply for the position, or None once the game is out of book.
+# HARD always plays the main line, MEDIUM samples by book weight and EASY
+# picks any book move uniformly so its openings vary the most.
+def get_opening_book_move(
+    board: chess.Board,
+    book: chess.polyglot.MemoryMappedReader | None,
+    difficulty: AIDifficulty,
+) -> chess.Move | None:
+    if book is None:
+        return None
+    entries = list(book.find_all(board))
+    if not entries:
+        return None
+    if difficulty == AIDifficulty.HARD:
+        return max(entries, key=lambda entry: entry.weight).move
+    if difficulty == AIDifficulty.MEDIUM:
+        weights = [entry.weight + 1 for entry in entries]
+        return random.choices(entries, weights=weights)[0].move
+    return random.choice(entries).move
+
+
+# Join with a single conditional UPDATE that only matches a game still waiting
+# for a second player; the row is only read again to explain a failed join
 async def join_existing_game_multiplayer(
     game_id: int, db: AsyncSession, player_id: str
 ):
+    stmt = (
+        update(Game)
+        .where(
+            Game.id == game_id,
+            Game.game_type == GameType.MULTIPLAYER,
+            Game.status == GameStatus.WAITING,
+            Game.player_black_id.is_(None),
+            Game.player_white_id != player_id,
+        )
+        .values(
+            player_black_id=player_id,
+            status=GameStatus.ONGOING,
+            # White's clock starts once both players are in (untimed stays NULL)
+            white_clock_ms=Game.time_base * 1000,
+            black_clock_ms=Game.time_base * 1000,
+            clock_started_at=now_ms(),
+            version=Game.version + 1,
+        )
+        .returning(Game)
+    )
+    result = await db.execute(stmt)
+    game = result.scalars().first()
+    if game:
+        await db.commit()
+        await game_clock.schedule(game)
+        return game
+
     stmt = select(Game).where(
         Game.id == game_id, Game.game_type == GameType.MULTIPLAYER
     )
@@ -45,22 +140,17 @@ async def join_existing_game_multiplayer(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Game is full"
         )
-    game.player_black_id = player_id
-    game.status = GameStatus.ONGOING
-    await db.commit()
-    await db.refresh(game)
-    return game
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail="Game is not waiting"
+    )
 
 
-# Validate and update the move in a multiplayer game and return the updated game and next turn
+# Validate and update the move in a multiplayer game and return the updated game
+# and the history records of the move
 async def validate_and_update_move_multiplayer(
     game_id: int, move: str, player_id: str, db: AsyncSession
 ):
-    stmt = select(Game).where(
-        Game.id == game_id, Game.game_type == GameType.MULTIPLAYER
-    )
-    result = await db.execute(stmt)
-    game = result.scalars().first()
+    game = await load_game(game_id, GameType.MULTIPLAYER, db)
     if not game:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Game not found"
@@ -79,7 +169,7 @@ async def validate_and_update_move_multiplayer(
         )
 
     # Initialize the board from the current FEN.
-    board = chess.Board() if game.fen == "startpos" else chess.Board(game.fen)
+    board = game_board(game)
 
     # Check if it is the current player's turn.
     if player_id == game.player_white_id and board.turn != chess.WHITE:
@@ -87,11 +177,8 @@ async def validate_and_update_move_multiplayer(
     if player_id == game.player_black_id and board.turn != chess.BLACK:
         raise HTTPException(status_code=400, detail="It is not your turn (Black)")
 
-    # Try to parse the move. This will raise an exception if the move is invalid.
-    try:
-        player_move = board.parse_san(move)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid move format")
+    # Parse the move (SAN or UCI). This will raise an exception if the move is invalid.
+    player_move = parse_move(board, move)
 
     # Verify that the piece being moved belongs to the current player.
     piece = board.piece_at(player_move.from_square)
@@ -106,36 +193,150 @@ async def validate_and_update_move_multiplayer(
             status_code=400, detail="You can only move your own pieces (Black)"
         )
 
+    # Stop the player's clock; a move that arrives after the flag fell loses on time.
+    if not press_clock(game, board):
+        await save_game(game, db)
+        await game_clock.schedule(game)
+        return game, []
+
     # Push the move onto the board.
-    board.push(player_move)
-    game.fen = board.fen()
+    record = push_move(game, board, player_move)
 
     # Update game status if checkmate, draw, or stalemate is reached.
-    if board.is_checkmate():
-        game.status = GameStatus.FINISHED  # Game over by checkmate
-        game.winner = Winner.WHITE if board.turn == chess.BLACK else Winner.BLACK
-    elif (
-        board.is_stalemate()
-        or board.is_insufficient_material()
-        or board.can_claim_fifty_moves()
-    ):
-        game.status = (
-            GameStatus.FINISHED
-        )  # Game drawn by stalemate, insufficient material, or fifty-move rule
-        game.winner = Winner.DRAW
+    finish_if_over(game, board)
 
-    await db.commit()
-    await db.refresh(game)
+    await save_game(game, db, [record])
+    await game_clock.schedule(game)
 
-    return game
+    return game, [record]
 
 
-async def validate_and_update_move_ai(
-    game_id: int, move: str, player_id: str, db: AsyncSession, request: Request
+# Open the Syzygy tables once; handles are opened lazily and shared afterwards
+def open_tablebase(path: str) -> chess.syzygy.Tablebase | None:
+    if not path:
+        return None
+    tablebase = chess.syzygy.Tablebase()
+    for directory in path.split(os.pathsep):
+        try:
+            tablebase.add_directory(directory)
+        except OSError as e:
+            print(f"Syzygy directory not loaded: {e}", flush=True)
+    return tablebase
+
+
+def close_tablebase(tablebase: chess.syzygy.Tablebase | None):
+    if tablebase is not None:
+        tablebase.close()
+
+
+def in_tablebase(board: chess.Board, tablebase: chess.syzygy.Tablebase | None):
+    return (
+        tablebase is not None
+        and chess.popcount(board.occupied) <= SYZYGY_MAX_PIECES
+        and not board.castling_rights
+    )
+
+
+# DTZ-optimal move for low-material positions, or None if the tables are missing.
+# Wins are converted as fast as possible and losses are dragged out.
+def get_tablebase_move(
+    board: chess.Board, tablebase: chess.syzygy.Tablebase | None
+) -> chess.Move | None:
+    if not in_tablebase(board, tablebase):
+        return None
+    best_move, best_key = None, None
+    try:
+        for move in board.legal_moves:
+            zeroing = board.is_zeroing(move)
+            board.push(move)
+            try:
+                if board.is_checkmate():
+                    key = (-3, 0, 0)
+                else:
+                    # Both values are from the opponent's point of view
+                    wdl = tablebase.probe_wdl(board)
+                    dtz = tablebase.probe_dtz(board)
+                    key = (wdl, 0 if zeroing and wdl < 0 else 1, -dtz)
+            finally:
+                board.pop()
+            if best_key is None or key < best_key:
+                best_move, best_key = move, key
+    except KeyError:
+        return None
+    return best_move
+
+
+# Finish the game as a draw when the tablebase proves the position is dead drawn
+def finish_if_tablebase_draw(
+    game: Game | HotGame, board: chess.Board, tablebase: chess.syzygy.Tablebase | None
 ):
-    stmt = select(Game).where(Game.id == game_id, Game.game_type == GameType.AI)
-    result = await db.execute(stmt)
-    game = result.scalars().first()
+    if not in_tablebase(board, tablebase):
+        return
+    try:
+        wdl = tablebase.probe_wdl(board)
+    except KeyError:
+        return
+    if wdl == 0:
+        game.status = GameStatus.FINISHED
+        game.winner = Winner.DRAW
+
+
+# Pick the AI reply: opening book, endgame tablebase, a pondered search, then the
+# reply cache, then a search on the configured engine backend
+async def get_ai_move(
+    game_id: int, board: chess.Board, difficulty: AIDifficulty, app: FastAPI
+) -> chess.Move:
+    ai_move = get_opening_book_move(board, app.state.opening_book, difficulty)
+    if ai_move is None:
+        ai_move = get_tablebase_move(board, app.state.tablebase)
+    if ai_move is None:
+        ai_move = await ponderer.take(game_id, board)
+    if ai_move is None:
+        ai_move = await ai_reply_cache.get(board, difficulty)
+    if ai_move is None:
+        result = await app.state.engine_backend.play(board, difficulty)
+        ai_move = result.move
+        # A search shed under load is weaker than the difficulty's own
+        if not result.info.get("shed"):
+            await ai_reply_cache.put(board, difficulty, ai_move)
+
+        # Keep a spare local engine busy on the reply the engine expects from
+        # the player (remote engine workers do not ponder)
+        engine_pool = app.state.engine_pools.get(difficulty)
+        if engine_pool is not None:
+            after_reply = board.copy(stack=False)
+            after_reply.push(ai_move)
+            ponderer.start(
+                game_id,
+                after_reply,
+                result.ponder,
+                engine_pool,
+                AI_SEARCH_PROFILES[difficulty],
+            )
+    return ai_move
+
+
+# Push the AI reply and update the game status if it ended the game.
+# Returns the history record of the reply.
+def apply_ai_move(
+    game: Game | HotGame,
+    board: chess.Board,
+    ai_move: chess.Move,
+    tablebase: chess.syzygy.Tablebase | None = None,
+) -> tuple[int, int]:
+    record = push_move(game, board, ai_move)
+    if not finish_if_over(game, board):
+        finish_if_tablebase_draw(game, board, tablebase)
+    return record
+
+
+# Validate the player's move in an AI game and push it onto the board.
+# Nothing is committed; the game is finished if the player's move ended it.
+# Also returns the history records to save with the game.
+async def apply_player_move_ai(
+    game_id: int, move: str, player_id: str, db: AsyncSession
+) -> tuple[Game | HotGame, chess.Board, list[tuple[int, int]]]:
+    game = await load_game(game_id, GameType.AI, db)
     if not game:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Game not found"
@@ -153,17 +354,14 @@ async def validate_and_update_move_ai(
         )
 
     # Initialize the board from the current FEN.
-    board = chess.Board() if game.fen == "startpos" else chess.Board(game.fen)
+    board = game_board(game)
 
     # Check if it is the current player's turn.
     if board.turn != chess.WHITE:
         raise HTTPException(status_code=400, detail="It is not your turn")
 
-    # Try to parse the move. This will raise an exception if the move is invalid.
-    try:
-        player_move = board.parse_san(move)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid move format")
+    # Parse the move (SAN or UCI). This will raise an exception if the move is invalid.
+    player_move = parse_move(board, move)
 
     # Verify that the piece being moved belongs to the current player.
     piece = board.piece_at(player_move.from_square)
@@ -175,69 +373,136 @@ async def validate_and_update_move_ai(
         )
 
     # Push the move onto the board.
-    board.push(player_move)
-    game.fen = board.fen()
+    moves = [push_move(game, board, player_move)]
 
     # Check if Player wins
-    if board.is_checkmate():
-        game.status = GameStatus.FINISHED
-        game.winner = Winner.WHITE
-        await db.commit()
-        await db.refresh(game)
-        return game
-    elif (
-        board.is_stalemate()
-        or board.is_insufficient_material()
-        or board.can_claim_fifty_moves()
-    ):
-        game.status = GameStatus.FINISHED
-        game.winner = Winner.DRAW
-        await db.commit()
-        await db.refresh(game)
-        return game
+    finish_if_over(game, board)
 
-    # AI Move
-    ai_difficulty = (
-        5
-        if game.ai_difficulty == AIDifficulty.EASY
-        else 12 if game.ai_difficulty == AIDifficulty.MEDIUM else 20
-    )
-    engine = request.app.state.engine
-    await engine.configure({"Skill Level": ai_difficulty})
+    return game, board, moves
 
-    ai_move = await engine.play(board, chess.engine.Limit(time=0.5))
-    board.push(ai_move.move)
-    game.fen = board.fen()
 
-    # Update game status if checkmate, draw, or stalemate is reached.
-    if board.is_checkmate():
-        game.status = GameStatus.FINISHED
-        game.winner = Winner.AI
-        await db.commit()
-        await db.refresh(game)
-        return game
-    elif (
-        board.is_stalemate()
-        or board.is_insufficient_material()
-        or board.can_claim_fifty_moves()
-    ):
-        game.status = GameStatus.FINISHED
-        game.winner = Winner.DRAW
-        await db.commit()
-        await db.refresh(game)
-        return game
+async def validate_and_update_move_ai(
+    game_id: int, move: str, player_id: str, db: AsyncSession, request: Request
+):
+    game, board, moves = await apply_player_move_ai(game_id, move, player_id, db)
+    tablebase = request.app.state.tablebase
+    if game.status == GameStatus.ONGOING:
+        finish_if_tablebase_draw(game, board, tablebase)
+    if game.status == GameStatus.ONGOING:
+        ai_move = await get_ai_move(game.id, board, game.ai_difficulty, request.app)
+        moves.append(apply_ai_move(game, board, ai_move, tablebase))
+
+    await save_game(game, db, moves)
+    return game, moves
 
-    await db.commit()
-    await db.refresh(game)
+
+# Commit only the player's move; the AI reply is played later by play_ai_reply
+async def validate_and_commit_move_ai(
+    game_id: int, move: str, player_id: str, db: AsyncSession
+):
+    game, _, moves = await apply_player_move_ai(game_id, move, player_id, db)
+    await save_game(game, db, moves)
+    return game, moves
+
+
+def _ai_reply_key(game_id: int) -> str:
+    return f"ai_reply:{game_id}"
+
+
+# An AI game stuck on the AI's turn: its reply failed, or the process
+# restarted before saving it. Returns the game, or None if it is not waiting
+# on the AI.
+async def find_stalled_ai_game(
+    game_id: int, db: AsyncSession, player_id: str
+) -> Game | HotGame | None:
+    game = await load_game(game_id, GameType.AI, db)
+    if not game or game.status != GameStatus.ONGOING:
+        return None
+    if game.player_white_id != player_id or game_board(game).turn != chess.BLACK:
+        return None
     return game
 
 
-async def resign_game_multiplayer(game_id: int, db: AsyncSession, player_id: str):
-    stmt = select(Game).where(
-        Game.id == game_id, Game.game_type == GameType.MULTIPLAYER
+# Background task: compute the AI reply and publish it. Only one runs per game
+# at a time, so scheduling it again for a stalled game is safe.
+async def play_ai_reply(game_id: int, app: FastAPI, redis_client: Redis):
+    key = _ai_reply_key(game_id)
+    if not await redis_client.set(key, 1, nx=True, ex=AI_REPLY_CLAIM_SECONDS):
+        return
+    try:
+        await _play_ai_reply(game_id, app, redis_client)
+    finally:
+        await redis_client.delete(key)
+
+
+# Computes the AI reply and publishes it. The game is read and
+# saved in short sessions of their own, so no connection is held during the
+# search. If the game changed meanwhile (the player resigned, say) the reply
+# is dropped; if the search keeps failing the player is told with an error
+# event, and the game stays on the AI's turn.
+async def _play_ai_reply(game_id: int, app: FastAPI, redis_client: Redis):
+    async with SessionLocal() as db:
+        game = await load_game(game_id, GameType.AI, db)
+    if not game or game.status != GameStatus.ONGOING:
+        return
+    board = game_board(game)
+    if board.turn != chess.BLACK:
+        return
+
+    moves = []
+    finish_if_tablebase_draw(game, board, app.state.tablebase)
+    if game.status == GameStatus.ONGOING:
+        for attempt in range(AI_REPLY_ATTEMPTS):
+            try:
+                ai_move = await get_ai_move(game.id, board, game.ai_difficulty, app)
+                break
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else e
+                print(f"AI reply for game {game_id} failed: {detail}", flush=True)
+                if attempt + 1 < AI_REPLY_ATTEMPTS:
+                    await asyncio.sleep(attempt + 1)
+        else:
+            await publish_redis(
+                game=game, type=RedisPublishType.AI_ERROR, redis_client=redis_client
+            )
+            return
+        moves.append(apply_ai_move(game, board, ai_move, app.state.tablebase))
+
+    try:
+        async with SessionLocal() as db:
+            await save_game(game, db, moves)
+    except HTTPException as e:
+        if e.status_code != status.HTTP_409_CONFLICT:
+            raise
+        print(f"AI reply for game {game_id} dropped: game changed", flush=True)
+        return
+
+    await publish_redis(
+        game=game,
+        type=RedisPublishType.MOVE,
+        redis_client=redis_client,
+        moves=moves,
     )
-    result = await db.execute(stmt)
-    game = result.scalars().first()
+
+
+# Game and the legal moves of its current position, from the per-position cache
+async def get_legal_moves(game_id: int, db: AsyncSession, player_id: str):
+    game = await get_game(game_id, db)
+    if not game:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Game not found"
+        )
+    if player_id not in (game.player_white_id, game.player_black_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="You are not in the game"
+        )
+    if game.status != GameStatus.ONGOING:
+        return game, ()
+    return game, legal_moves(game.fen)
+
+
+async def resign_game_multiplayer(game_id: int, db: AsyncSession, player_id: str):
+    game = await load_game(game_id, GameType.MULTIPLAYER, db)
     if not game:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Game not found"
@@ -257,15 +522,57 @@ async def resign_game_multiplayer(game_id: int, db: AsyncSession, player_id: str
             status_code=status.HTTP_400_BAD_REQUEST, detail="You are not in the game"
         )
     game.status = GameStatus.FINISHED
-    await db.commit()
-    await db.refresh(game)
+    await save_game(game, db)
+    await game_clock.schedule(game)
     return game
 
 
+def _draw_offer_key(game_id: int) -> str:
+    return f"draw_offer:{game_id}"
+
+
+# Offer a draw, or accept the opponent's standing offer. An offer stands until
+# the opponent has had a move, so playing that move declines it. Returns the
+# game and whether it ended in a draw.
+async def offer_draw(
+    game_id: int, db: AsyncSession, player_id: str, redis_client: Redis
+) -> tuple[Game | HotGame, bool]:
+    game = await load_game(game_id, GameType.MULTIPLAYER, db)
+    if not game:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Game not found"
+        )
+    if game.status != GameStatus.ONGOING:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Game is not ongoing"
+        )
+    if player_id not in (game.player_white_id, game.player_black_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="You are not in the game"
+        )
+
+    board = game_board(game)
+    key = _draw_offer_key(game.id)
+    offer = await redis_client.get(key)
+    if offer:
+        offered_by, last_ply = offer.split("|")
+        if offered_by != player_id and board.ply() <= int(last_ply):
+            game.status = GameStatus.FINISHED
+            game.winner = Winner.DRAW
+            await save_game(game, db)
+            await game_clock.schedule(game)
+            await redis_client.delete(key)
+            return game, True
+
+    # The last ply at which the opponent can still accept
+    color = chess.WHITE if player_id == game.player_white_id else chess.BLACK
+    last_ply = board.ply() + (1 if board.turn == color else 0)
+    await redis_client.set(key, f"{player_id}|{last_ply}", ex=DRAW_OFFER_TTL_SECONDS)
+    return game, False
+
+
 async def resign_ai_game(game_id: int, db: AsyncSession, player_id: str):
-    stmt = select(Game).where(Game.id == game_id, Game.game_type == GameType.AI)
-    result = await db.execute(stmt)
-    game = result.scalars().first()
+    game = await load_game(game_id, GameType.AI, db)
     if not game:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Game not found"
@@ -280,21 +587,37 @@ async def resign_ai_game(game_id: int, db: AsyncSession, player_id: str):
         )
     game.winner = Winner.AI
     game.status = GameStatus.FINISHED
-    await db.commit()
-    await db.refresh(game)
+    await save_game(game, db)
     return game
 
 
-async def publish_redis(game: Game, type: RedisPublishType, redis_client: Redis):
-    payload = {
-        "type": type,
-        "game_id": game.id,
-        "fen": game.fen,
-        "status": game.status,
-        "winner": game.winner,
-    }
+# Timer wheel callback: finish the game on time if its clock really ran out
+async def flag_game(game_id: int, redis_client: Redis):
+    async with SessionLocal() as db:
+        game = await load_game(game_id, GameType.MULTIPLAYER, db)
+        if not game or game.status != GameStatus.ONGOING:
+            return
+        if not flag_fell(game):
+            # A move came in after the deadline was set; track the new one
+            await game_clock.schedule(game)
+            return
+        finish_on_time(game, game_board(game))
+        await save_game(game, db)
+
+    await publish_redis(
+        game=game, type=RedisPublishType.TIMEOUT, redis_client=redis_client
+    )
+
+
+# Publish a numbered game event; `moves` are the history records it added
+async def publish_redis(
+    game: Game | HotGame,
+    type: RedisPublishType,
+    redis_client: Redis,
+    moves: list[tuple[int, int]] = (),
+):
     try:
-        await redis_client.publish(f"game_{game.id}", json.dumps(payload))
+        await publish_event(redis_client, game, type, moves)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to publish move to Redis: {e}"
@@ -0,0 +1,143 @@
+import json
+from functools import lru_cache
+import chess.polyglot
+import msgpack
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.constants import GameStatus
+from app.core.redis_client import redis_client
+from app.services.game_state import game_board, get_game
+from app.services.move_history import decode_move, unpack_keys
+
+EVENT_CACHE_SIZE = 4096
+
+# Number the event with the game's next sequence number, append it to the
+# game's capped stream under that number and publish it, all in one step, so
+# events reach every subscriber and the log in sequence order. Once the game
+# is over both keys only live long enough for late reconnects. If the stream
+# rejects the number (the counter was lost) the event is still published;
+# replay then finds the gap and falls back to a snapshot.
+PUBLISH_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+local event = '{"seq": ' .. seq .. ', ' .. string.sub(ARGV[1], 2)
+redis.pcall('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], seq .. '-0', 'event', event)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('PUBLISH', KEYS[3], event)
+return seq
+"""
+
+_publish = redis_client.register_script(PUBLISH_SCRIPT)
+
+
+def _seq_key(game_id: int) -> str:
+    return f"game_events:{game_id}:seq"
+
+
+def _stream_key(game_id: int) -> str:
+    return f"game_events:{game_id}"
+
+
+# Zobrist hash of the current position, so clients can check a delta landed
+# on the position they have
+def position_hash(game) -> str:
+    keys = unpack_keys(game.repetition_keys)
+    key = keys[-1] if keys else chess.polyglot.zobrist_hash(game_board(game))
+    return f"{key:016x}"
+
+
+# Publish a game event on the game channel; `moves` are the history records
+# (ply, code) the event added. Returns the event's sequence number.
+async def publish_event(redis: Redis, game, type: str, moves=()) -> int:
+    event = {
+        "type": type,
+        "game_id": game.id,
+        "fen": game.fen,
+        "status": game.status,
+        "winner": game.winner,
+        "white_clock_ms": game.white_clock_ms,
+        "black_clock_ms": game.black_clock_ms,
+        "moves": [decode_move(code).uci() for _, code in moves],
+        "hash": position_hash(game),
+    }
+    ttl = (
+        settings.GAME_EVENTS_FINISHED_TTL_SECONDS
+        if game.status == GameStatus.FINISHED
+        else settings.GAME_EVENTS_TTL_SECONDS
+    )
+    return await _publish(
+        keys=[_seq_key(game.id), _stream_key(game.id), f"game_{game.id}"],
+        args=[json.dumps(event), settings.GAME_EVENTS_MAXLEN, ttl],
+        client=redis,
+    )
+
+
+# Sequence number of the game's last event, 0 if there was none, or None if
+# the counter is gone (expired or lost)
+async def current_seq(game_id: int, redis: Redis) -> int | None:
+    seq = await redis.get(_seq_key(game_id))
+    return None if seq is None else int(seq)
+
+
+# Events published after `last_seq`, from the game's stream, or None if the
+# client needs a snapshot instead: some of them were trimmed already, or the
+# counter is gone or behind `last_seq` (it was lost and started over)
+async def events_since(game_id: int, last_seq: int, redis: Redis) -> list[str] | None:
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.get(_seq_key(game_id))
+        pipe.xrange(_stream_key(game_id), min=f"{last_seq + 1}-0")
+        seq, entries = await pipe.execute()
+    if seq is None or int(seq) < last_seq:
+        return None
+    if not entries:
+        return [] if int(seq) == last_seq else None
+    if entries[0][0] != f"{last_seq + 1}-0":
+        return None
+    return [fields["event"] for _, fields in entries]
+
+
+# Full state of the game for a client that missed events. The sequence number
+# is read first: the state is at least that recent, and clients skip later
+# events whose hash they already have.
+async def game_snapshot(game_id: int, db: AsyncSession, redis: Redis) -> dict | None:
+    seq = await current_seq(game_id, redis) or 0
+    game = await get_game(game_id, db)
+    if game is None:
+        return None
+    return {
+        "type": "snapshot",
+        "seq": seq,
+        "game_id": game.id,
+        "fen": game.fen,
+        "status": game.status.value,
+        "winner": game.winner.value,
+        "white_clock_ms": game.white_clock_ms,
+        "black_clock_ms": game.black_clock_ms,
+        "hash": position_hash(game),
+    }
+
+
+def encode(payload: dict, format: str) -> str | bytes:
+    if format == "msgpack":
+        return msgpack.packb(payload)
+    return json.dumps(payload)
+
+
+def decode(frame: str | bytes) -> dict:
+    if isinstance(frame, bytes):
+        return msgpack.unpackb(frame)
+    return json.loads(frame)
+
+
+# Sequence number and wire form of a published event. "json" is the event as
+# published; "delta" and "msgpack" leave out the FEN, as the moves and hash
+# carry the change. Cached, so each event is encoded once per format however
+# many sockets watch the game.
+@lru_cache(maxsize=EVENT_CACHE_SIZE)
+def encode_event(data: str, format: str) -> tuple[int | None, str | bytes]:
+    event = json.loads(data)
+    if format == "json":
+        return event.get("seq"), data
+    event.pop("fen", None)
+    return event.get("seq"), encode(event, format)
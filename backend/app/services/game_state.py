@@ -0,0 +1,552 @@
+import asyncio
+from collections import OrderedDict
+import chess
+from fastapi import HTTPException, status
+from redis.asyncio import Redis
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm.attributes import set_committed_value
+from app.core.config import settings
+from app.core.constants import AIDifficulty, GameStatus, GameType, Winner
+from app.core.database import SessionLocal
+from app.core.redis_client import redis_client
+from app.models.game import Game
+from app.services.move_history import append_moves
+from app.services.ratings import apply_ratings, apply_ratings_batch
+
+DIRTY_KEY = "game_state:dirty"
+MOVES_BATCH = 1000
+
+# Write the new state only if the stored version is still the one we read
+# ("-1" = key must not exist yet), then refresh the TTL.
+SAVE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'version') or '-1'
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def _optional_int(value: str | None) -> int | None:
+    return int(value) if value else None
+
+
+def _optional_str(value: int | None) -> int | str:
+    return "" if value is None else value
+
+
+class HotGame:
+    """Compact live state of an ongoing game, read like a Game row."""
+
+    __slots__ = (
+        "id",
+        "player_white_id",
+        "player_black_id",
+        "game_type",
+        "ai_difficulty",
+        "fen",
+        "status",
+        "winner",
+        "repetition_keys",
+        "time_base",
+        "time_increment",
+        "white_clock_ms",
+        "black_clock_ms",
+        "clock_started_at",
+        "version",
+        "_board",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        player_white_id: str,
+        player_black_id: str | None,
+        game_type: GameType,
+        ai_difficulty: AIDifficulty | None,
+        fen: str,
+        status: GameStatus,
+        winner: Winner,
+        repetition_keys: bytes | None = None,
+        time_base: int | None = None,
+        time_increment: int = 0,
+        white_clock_ms: int | None = None,
+        black_clock_ms: int | None = None,
+        clock_started_at: int | None = None,
+        version: int = -1,
+    ):
+        self.id = id
+        self.player_white_id = player_white_id
+        self.player_black_id = player_black_id
+        self.game_type = game_type
+        self.ai_difficulty = ai_difficulty
+        self.fen = fen
+        self.status = status
+        self.winner = winner
+        self.repetition_keys = repetition_keys
+        self.time_base = time_base
+        self.time_increment = time_increment
+        self.white_clock_ms = white_clock_ms
+        self.black_clock_ms = black_clock_ms
+        self.clock_started_at = clock_started_at
+        self.version = version
+        self._board: chess.Board | None = None
+
+    @classmethod
+    def from_game(cls, game: Game) -> "HotGame":
+        return cls(
+            id=game.id,
+            player_white_id=game.player_white_id,
+            player_black_id=game.player_black_id,
+            game_type=game.game_type,
+            ai_difficulty=game.ai_difficulty,
+            fen=game.fen,
+            status=game.status,
+            winner=game.winner,
+            repetition_keys=game.repetition_keys,
+            time_base=game.time_base,
+            time_increment=game.time_increment,
+            white_clock_ms=game.white_clock_ms,
+            black_clock_ms=game.black_clock_ms,
+            clock_started_at=game.clock_started_at,
+        )
+
+    # Fields added to the hash over time are optional, so entries written by
+    # an older version still load
+    @classmethod
+    def from_redis(cls, data: dict) -> "HotGame":
+        return cls(
+            id=int(data["id"]),
+            player_white_id=data["player_white_id"],
+            player_black_id=data["player_black_id"] or None,
+            game_type=GameType(data["game_type"]),
+            ai_difficulty=(
+                AIDifficulty(data["ai_difficulty"]) if data["ai_difficulty"] else None
+            ),
+            fen=data["fen"],
+            status=GameStatus(data["status"]),
+            winner=Winner(data["winner"]),
+            repetition_keys=bytes.fromhex(data.get("repetition_keys", "")),
+            time_base=_optional_int(data.get("time_base")),
+            time_increment=int(data.get("time_increment", 0)),
+            white_clock_ms=_optional_int(data.get("white_clock_ms")),
+            black_clock_ms=_optional_int(data.get("black_clock_ms")),
+            clock_started_at=_optional_int(data.get("clock_started_at")),
+            version=int(data.get("version", -1)),
+        )
+
+    def to_redis(self) -> dict:
+        return {
+            "id": self.id,
+            "player_white_id": self.player_white_id,
+            "player_black_id": self.player_black_id or "",
+            "game_type": self.game_type.value,
+            "ai_difficulty": self.ai_difficulty.value if self.ai_difficulty else "",
+            "fen": self.fen,
+            "status": self.status.value,
+            "winner": self.winner.value,
+            "repetition_keys": (self.repetition_keys or b"").hex(),
+            "time_base": _optional_str(self.time_base),
+            "time_increment": self.time_increment,
+            "white_clock_ms": _optional_str(self.white_clock_ms),
+            "black_clock_ms": _optional_str(self.black_clock_ms),
+            "clock_started_at": _optional_str(self.clock_started_at),
+            "version": self.version,
+        }
+
+    # Independent copy for a state change, sharing the parsed board
+    def copy(self) -> "HotGame":
+        game = HotGame(**{field: getattr(self, field) for field in self.__slots__[:-1]})
+        game._board = self._board
+        return game
+
+    # Board for the current FEN; parsed once per version and copied per move
+    def board(self) -> chess.Board:
+        if self._board is None or self._board.fen() != self.fen:
+            self._board = (
+                chess.Board() if self.fen == "startpos" else chess.Board(self.fen)
+            )
+        return self._board.copy(stack=False)
+
+
+class GameStateStore:
+    """Hot state of ongoing games in Redis, persisted to Postgres write-behind.
+
+    Redis holds the authoritative live state of every ongoing game and each
+    process keeps the last version it saw, so a move only costs a version
+    check (plus a full read when another process moved in between) and a
+    compare-and-set write. Changed games are collected in a dirty set that a
+    background task flushes to Postgres in batches; finished games are
+    persisted right away and evicted. The dirty set survives restarts, so a
+    new process starts by flushing whatever the previous one left behind.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        enabled: bool,
+        local_size: int,
+        ttl: int,
+        flush_interval: float,
+        flush_batch: int,
+    ):
+        self.redis = redis
+        self.enabled = enabled
+        self.local_size = local_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._local: OrderedDict[int, HotGame] = OrderedDict()
+        self._save = redis.register_script(SAVE_SCRIPT)
+        self._task: asyncio.Task | None = None
+        self.counters = {"local_hits": 0, "redis_hits": 0, "db_loads": 0, "flushed": 0}
+
+    @staticmethod
+    def _key(game_id: int) -> str:
+        return f"game_state:{game_id}"
+
+    # Moves not yet appended to the history table, as "ply:code" entries
+    @staticmethod
+    def _moves_key(game_id: int) -> str:
+        return f"game_state:{game_id}:moves"
+
+    def _remember(self, game: HotGame):
+        self._local[game.id] = game
+        self._local.move_to_end(game.id)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    # Hot state of a game, or None if it is not kept hot. The copy is the
+    # caller's own to change.
+    async def read(self, game_id: int) -> HotGame | None:
+        local = self._local.get(game_id)
+        if local is not None:
+            version = await self.redis.hget(self._key(game_id), "version")
+            if version is not None and int(version) == local.version:
+                self.counters["local_hits"] += 1
+                return local.copy()
+        data = await self.redis.hgetall(self._key(game_id))
+        if not data:
+            return None
+        self.counters["redis_hits"] += 1
+        game = HotGame.from_redis(data)
+        self._remember(game)
+        return game.copy()
+
+    async def load(
+        self, game_id: int, game_type: GameType, db: AsyncSession
+    ) -> HotGame | None:
+        game = await self.read(game_id)
+        if game is None:
+            stmt = select(Game).where(Game.id == game_id)
+            result = await db.execute(stmt)
+            row = result.scalars().first()
+            if not row:
+                return None
+            self.counters["db_loads"] += 1
+            game = HotGame.from_game(row)
+            # Only ongoing games are kept hot; seed them unless another
+            # process got there first
+            if game.status == GameStatus.ONGOING:
+                if await self._write(game):
+                    self._remember(game.copy())
+                else:
+                    game = await self.read(game_id) or game
+        return game if game.game_type == game_type else None
+
+    async def _write(self, game: HotGame) -> bool:
+        mapping = game.to_redis()
+        mapping["version"] = game.version + 1
+        args = [game.version, self.ttl]
+        for field, value in mapping.items():
+            args.extend((field, value))
+        if not await self._save(keys=[self._key(game.id)], args=args):
+            return False
+        game.version += 1
+        return True
+
+    async def save(
+        self, game: HotGame, db: AsyncSession, moves: list[tuple[int, int]] = ()
+    ):
+        if not await self._write(game):
+            self._local.pop(game.id, None)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Game was updated concurrently, please retry",
+            )
+        if game.status == GameStatus.FINISHED:
+            # Finished games go to Postgres right away. If that fails the
+            # state stays hot and dirty, so the next flush finishes the row.
+            history = {game.id: await self._pop_moves(game.id) + list(moves)}
+            try:
+                await self._store([game], history, db)
+            except Exception as e:
+                await db.rollback()
+                await self._requeue([game.id], history)
+                print(f"Finishing game {game.id} failed: {e}", flush=True)
+        else:
+            if moves:
+                await self.redis.rpush(
+                    self._moves_key(game.id),
+                    *(f"{ply}:{code}" for ply, code in moves),
+                )
+            await self.redis.sadd(DIRTY_KEY, game.id)
+            self._remember(game.copy())
+
+    # Drop the hot state of games that were finished directly in Postgres
+    async def evict(self, game_ids: list[int]):
+        if not self.enabled or not game_ids:
+            return
+        keys = [self._key(game_id) for game_id in game_ids]
+        keys += [self._moves_key(game_id) for game_id in game_ids]
+        await self.redis.delete(*keys)
+        await self.redis.srem(DIRTY_KEY, *game_ids)
+        for game_id in game_ids:
+            self._local.pop(game_id, None)
+
+    # Put games and their popped history back for the next flush
+    async def _requeue(
+        self, game_ids: list[int], moves: dict[int, list[tuple[int, int]]]
+    ):
+        await self.redis.sadd(DIRTY_KEY, *game_ids)
+        for game_id, game_moves in moves.items():
+            if game_moves:
+                await self.redis.rpush(
+                    self._moves_key(game_id),
+                    *(f"{ply}:{code}" for ply, code in game_moves),
+                )
+
+    # Write states and their history in one transaction. Finished games are
+    # rated and their hot state dropped once committed.
+    async def _store(
+        self,
+        states: list[HotGame],
+        moves: dict[int, list[tuple[int, int]]],
+        db: AsyncSession,
+    ):
+        finished = [state for state in states if state.status == GameStatus.FINISHED]
+        ongoing = set()
+        if finished:
+            # Locked until the commit. Only rows still ongoing are rated: one
+            # finished elsewhere (by the reaper, say) was rated already.
+            result = await db.execute(
+                select(Game.id)
+                .where(
+                    Game.id.in_([state.id for state in finished]),
+                    Game.status == GameStatus.ONGOING,
+                )
+                .with_for_update()
+            )
+            ongoing = set(result.scalars().all())
+        await self._persist(states, db)
+        for game_id, game_moves in moves.items():
+            await append_moves(db, game_id, game_moves)
+        await apply_ratings_batch(
+            [state for state in finished if state.id in ongoing], db
+        )
+        await db.commit()
+        if finished:
+            game_ids = [state.id for state in finished]
+            await self.redis.delete(*(self._key(game_id) for game_id in game_ids))
+            await self.redis.srem(DIRTY_KEY, *game_ids)
+            for game_id in game_ids:
+                self._local.pop(game_id, None)
+
+    async def _pop_moves(self, game_id: int) -> list[tuple[int, int]]:
+        entries = await self.redis.lpop(self._moves_key(game_id), MOVES_BATCH) or []
+        return [tuple(map(int, entry.split(":"))) for entry in entries]
+
+    # Batched UPDATE; rows that already finished are never overwritten by a
+    # late write-behind flush of an older state
+    @staticmethod
+    async def _persist(states: list[HotGame], db: AsyncSession):
+        games = Game.__table__
+        stmt = (
+            update(games)
+            .where(
+                games.c.id == bindparam("b_id"),
+                games.c.status == GameStatus.ONGOING,
+            )
+            .values(
+                fen=bindparam("b_fen"),
+                status=bindparam("b_status"),
+                winner=bindparam("b_winner"),
+                repetition_keys=bindparam("b_repetition_keys"),
+                white_clock_ms=bindparam("b_white_clock_ms"),
+                black_clock_ms=bindparam("b_black_clock_ms"),
+                clock_started_at=bindparam("b_clock_started_at"),
+                version=games.c.version + 1,
+            )
+        )
+        await db.execute(
+            stmt,
+            [
+                {
+                    "b_id": state.id,
+                    "b_fen": state.fen,
+                    "b_status": state.status,
+                    "b_winner": state.winner,
+                    "b_repetition_keys": state.repetition_keys or b"",
+                    "b_white_clock_ms": state.white_clock_ms,
+                    "b_black_clock_ms": state.black_clock_ms,
+                    "b_clock_started_at": state.clock_started_at,
+                }
+                for state in states
+            ],
+        )
+
+    # Write one batch of dirty games to Postgres; returns how many were written
+    async def flush(self) -> int:
+        game_ids = await self.redis.spop(DIRTY_KEY, self.flush_batch)
+        if not game_ids:
+            return 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for game_id in game_ids:
+                pipe.hgetall(self._key(game_id))
+            states = [
+                HotGame.from_redis(state) for state in await pipe.execute() if state
+            ]
+        if not states:
+            return 0
+        moves = {state.id: await self._pop_moves(state.id) for state in states}
+        try:
+            async with SessionLocal() as db:
+                await self._store(states, moves, db)
+        except Exception:
+            await self._requeue(game_ids, moves)
+            raise
+        self.counters["flushed"] += len(states)
+        return len(states)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                while await self.flush() == self.flush_batch:
+                    pass
+            except Exception as e:
+                print(f"Game state flush failed: {e}", flush=True)
+
+    # Recover what a previous process left unflushed, then flush periodically
+    async def start(self):
+        if not self.enabled:
+            return
+        try:
+            while await self.flush():
+                pass
+        except Exception as e:
+            print(f"Game state recovery failed: {e}", flush=True)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        try:
+            while await self.flush():
+                pass
+        except Exception as e:
+            print(f"Game state final flush failed: {e}", flush=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "local_games": len(self._local),
+            **self.counters,
+        }
+
+
+game_state_store = GameStateStore(
+    redis=redis_client,
+    enabled=settings.HOT_STATE_ENABLED,
+    local_size=settings.HOT_STATE_LOCAL_SIZE,
+    ttl=settings.HOT_STATE_TTL_SECONDS,
+    flush_interval=settings.HOT_STATE_FLUSH_INTERVAL,
+    flush_batch=settings.HOT_STATE_FLUSH_BATCH,
+)
+
+
+# Load a game for a state change: hot state when enabled, otherwise the row
+async def load_game(
+    game_id: int, game_type: GameType, db: AsyncSession
+) -> Game | HotGame | None:
+    if game_state_store.enabled:
+        return await game_state_store.load(game_id, game_type, db)
+    stmt = select(Game).where(Game.id == game_id, Game.game_type == game_type)
+    result = await db.execute(stmt)
+    game = result.scalars().first()
+    # Detached, so changes are only written by the conditional update below
+    if game is not None:
+        db.expunge(game)
+    return game
+
+
+# Current state of a game for read-only use: the hot copy if there is one
+async def get_game(game_id: int, db: AsyncSession) -> Game | HotGame | None:
+    if game_state_store.enabled:
+        game = await game_state_store.read(game_id)
+        if game is not None:
+            return game
+    stmt = select(Game).where(Game.id == game_id)
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+
+# Write the given columns with a single UPDATE that only matches the version
+# the game was read at; anyone else writing in between gets a 409
+async def update_game(game: Game, db: AsyncSession, **values):
+    games = Game.__table__
+    stmt = (
+        update(games)
+        .where(games.c.id == game.id, games.c.version == game.version)
+        .values(**values, version=games.c.version + 1)
+        .returning(games.c.version, games.c.updated_at)
+    )
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Game was updated concurrently, please retry",
+        )
+    set_committed_value(game, "version", row.version)
+    set_committed_value(game, "updated_at", row.updated_at)
+
+
+# Save a state change together with the moves it added to the history
+async def save_game(
+    game: Game | HotGame, db: AsyncSession, moves: list[tuple[int, int]] = ()
+):
+    moves = list(moves)
+    if isinstance(game, HotGame):
+        await game_state_store.save(game, db, moves)
+    else:
+        await update_game(
+            game,
+            db,
+            fen=game.fen,
+            status=game.status,
+            winner=game.winner,
+            repetition_keys=game.repetition_keys,
+            white_clock_ms=game.white_clock_ms,
+            black_clock_ms=game.black_clock_ms,
+            clock_started_at=game.clock_started_at,
+        )
+        await append_moves(db, game.id, moves)
+        if game.status == GameStatus.FINISHED:
+            await apply_ratings(game, db)
+        await db.commit()
+
+
+def game_board(game: Game | HotGame) -> chess.Board:
+    if isinstance(game, HotGame):
+        return game.board()
+    return chess.Board() if game.fen == "startpos" else chess.Board(game.fen)
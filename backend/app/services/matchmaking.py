@@ -0,0 +1,289 @@
+import asyncio
+import json
+import random
+from fastapi import HTTPException, status
+from redis.asyncio import Redis
+from sqlalchemy import insert
+from app.core.config import settings
+from app.core.constants import GameStatus, GameType, RedisPublishType, Winner
+from app.core.database import SessionLocal
+from app.core.metrics import LatencyStats
+from app.core.redis_client import redis_client
+from app.models.game import Game
+from app.models.user import User
+from app.services.clock import game_clock, now_ms
+
+PLAYERS_KEY = "matchmaking:players"  # user id -> "pool|enqueued at (epoch ms)"
+POOLS_KEY = "matchmaking:pools"
+
+# Queue a player unless they already wait in some pool
+ENQUEUE_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[3] .. '|' .. ARGV[4])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[3])
+return 1
+"""
+
+# Take both players of a pair out of the queue, only if neither cancelled
+CONFIRM_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0
+        or redis.call('HEXISTS', KEYS[1], ARGV[2]) == 0 then
+    return 0
+end
+redis.call('HDEL', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+
+# Put unmatched players back, skipping those who cancelled meanwhile
+REQUEUE_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    if redis.call('HEXISTS', KEYS[1], ARGV[i]) == 1 then
+        redis.call('ZADD', KEYS[2], ARGV[i + 1], ARGV[i])
+    end
+end
+return 1
+"""
+
+
+def _queue_key(pool: str) -> str:
+    return f"matchmaking:queue:{pool}"
+
+
+# Players are matched per time control, e.g. "300+2", or "untimed"
+def pool_name(time_base: int | None, time_increment: int) -> str:
+    if time_base is None:
+        return "untimed"
+    return f"{time_base}+{time_increment}"
+
+
+def parse_pool(pool: str) -> tuple[int | None, int]:
+    if pool == "untimed":
+        return None, 0
+    time_base, time_increment = pool.split("+")
+    return int(time_base), int(time_increment)
+
+
+# Pair neighbours in rating order whose ratings are close enough. The allowed
+# gap widens with the time the longer-waiting player has spent in the queue.
+# Entries are (user id, rating, seconds waited).
+def pair_players(
+    entries: list[tuple[str, float, float]], window: float, growth: float
+) -> tuple[list[tuple[str, str]], list[tuple[str, float, float]]]:
+    entries = sorted(entries, key=lambda entry: entry[1])
+    pairs, leftovers = [], []
+    i = 0
+    while i < len(entries) - 1:
+        first, second = entries[i], entries[i + 1]
+        if second[1] - first[1] <= window + growth * max(first[2], second[2]):
+            pairs.append((first[0], second[0]))
+            i += 2
+        else:
+            leftovers.append(first)
+            i += 1
+    leftovers.extend(entries[i:])
+    return pairs, leftovers
+
+
+class Matchmaker:
+    """Redis sorted-set matchmaking queues, one per time control, by rating.
+
+    Enqueueing is a single script call. A matcher task on every instance pops
+    each queue in batches (ZPOPMIN, so every player is claimed by exactly one
+    instance), pairs players of similar skill, confirms that neither side
+    cancelled in the meantime and creates all games of a batch with one bulk
+    insert. Both players are notified on their user channel.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        interval: float,
+        batch: int,
+        window: float,
+        growth: float,
+    ):
+        self.redis = redis
+        self.interval = interval
+        self.batch = batch
+        self.window = window
+        self.growth = growth
+        self._enqueue = redis.register_script(ENQUEUE_SCRIPT)
+        self._confirm = redis.register_script(CONFIRM_SCRIPT)
+        self._requeue = redis.register_script(REQUEUE_SCRIPT)
+        self._task: asyncio.Task | None = None
+        self.queue_wait = LatencyStats()
+        self.counters = {"enqueued": 0, "matches": 0}
+
+    async def enqueue(
+        self, user: User, time_base: int | None, time_increment: int
+    ) -> str:
+        pool = pool_name(time_base, time_increment)
+        queued = await self._enqueue(
+            keys=[PLAYERS_KEY, _queue_key(pool), POOLS_KEY],
+            args=[user.id, user.rating, pool, now_ms()],
+        )
+        if not queued:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="You are already in the matchmaking queue",
+            )
+        self.counters["enqueued"] += 1
+        return pool
+
+    async def cancel(self, user: User):
+        entry = await self.redis.hget(PLAYERS_KEY, user.id)
+        if entry is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="You are not in the matchmaking queue",
+            )
+        pool = entry.split("|")[0]
+        await self.redis.hdel(PLAYERS_KEY, user.id)
+        await self.redis.zrem(_queue_key(pool), user.id)
+
+    # Drain a pool batch by batch, carrying unmatched players over to the next
+    # batch, and put whoever is left back at the end; returns the matches made
+    async def match_pool(self, pool: str) -> int:
+        queue_key = _queue_key(pool)
+        carry, unconfirmed, matches = [], [], 0
+        scores, enqueued_at = {}, {}
+        try:
+            while True:
+                popped = await self.redis.zpopmin(queue_key, self.batch)
+                if not popped:
+                    break
+                entries = await self.redis.hmget(
+                    PLAYERS_KEY, [user_id for user_id, _ in popped]
+                )
+                now = now_ms()
+                for (user_id, score), entry in zip(popped, entries):
+                    if entry is None:
+                        continue  # Cancelled
+                    scores[user_id] = score
+                    enqueued_at[user_id] = int(entry.split("|")[1])
+                    waited = (now - enqueued_at[user_id]) / 1000
+                    carry.append((user_id, score, waited))
+
+                pairs, carry = pair_players(carry, self.window, self.growth)
+                confirmed = []
+                for pair in pairs:
+                    if await self._confirm(keys=[PLAYERS_KEY], args=pair):
+                        confirmed.append(pair)
+                    else:
+                        unconfirmed.extend(pair)  # The requeue skips the canceller
+                if confirmed:
+                    await self._create_games(pool, confirmed, scores, enqueued_at)
+                    matches += len(confirmed)
+                if len(popped) < self.batch:
+                    break
+        finally:
+            players = [user_id for user_id, _, _ in carry] + unconfirmed
+            if players:
+                args = []
+                for user_id in players:
+                    args.extend((user_id, scores[user_id]))
+                await self._requeue(keys=[PLAYERS_KEY, queue_key], args=args)
+        self.counters["matches"] += matches
+        return matches
+
+    # One bulk insert for every game of the batch, then notify both players.
+    # If the insert fails the players go back in the queue with their wait.
+    async def _create_games(
+        self,
+        pool: str,
+        pairs: list[tuple[str, str]],
+        scores: dict[str, float],
+        enqueued_at: dict[str, int],
+    ):
+        time_base, time_increment = parse_pool(pool)
+        clock_ms = time_base * 1000 if time_base is not None else None
+        started_at = now_ms() if time_base is not None else None
+        rows = []
+        for pair in pairs:
+            white, black = random.sample(pair, 2)
+            rows.append(
+                {
+                    "player_white_id": white,
+                    "player_black_id": black,
+                    "game_type": GameType.MULTIPLAYER,
+                    "fen": "startpos",
+                    "status": GameStatus.ONGOING,
+                    "winner": Winner.ONGOING,
+                    "time_base": time_base,
+                    "time_increment": time_increment,
+                    "white_clock_ms": clock_ms,
+                    "black_clock_ms": clock_ms,
+                    "clock_started_at": started_at,
+                }
+            )
+        try:
+            async with SessionLocal() as db:
+                result = await db.execute(
+                    insert(Game).returning(Game.id, sort_by_parameter_order=True),
+                    rows,
+                )
+                game_ids = result.scalars().all()
+                await db.commit()
+        except Exception:
+            for user_id in (user_id for pair in pairs for user_id in pair):
+                await self._enqueue(
+                    keys=[PLAYERS_KEY, _queue_key(pool), POOLS_KEY],
+                    args=[user_id, scores[user_id], pool, enqueued_at[user_id]],
+                )
+            raise
+
+        now = now_ms()
+        for user_id in (user_id for pair in pairs for user_id in pair):
+            self.queue_wait.observe((now - enqueued_at[user_id]) / 1000)
+
+        for game_id, row in zip(game_ids, rows):
+            await game_clock.schedule(Game(id=game_id, **row))
+            for user_id, color in (
+                (row["player_white_id"], "white"),
+                (row["player_black_id"], "black"),
+            ):
+                payload = {
+                    "type": RedisPublishType.MATCH,
+                    "game_id": game_id,
+                    "color": color,
+                }
+                await self.redis.publish(f"user_{user_id}", json.dumps(payload))
+
+    async def run_once(self):
+        for pool in await self.redis.smembers(POOLS_KEY):
+            await self.match_pool(pool)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Matchmaking run failed: {e}", flush=True)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self) -> dict:
+        return {**self.counters, "queue_wait": self.queue_wait.stats()}
+
+
+matchmaker = Matchmaker(
+    redis=redis_client,
+    interval=settings.MATCHMAKING_INTERVAL_SECONDS,
+    batch=settings.MATCHMAKING_BATCH,
+    window=settings.MATCHMAKING_SKILL_WINDOW,
+    growth=settings.MATCHMAKING_WINDOW_GROWTH,
+)
@@ -0,0 +1,61 @@
+import struct
+import chess
+import chess.polyglot
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.move import GameMove
+
+KEY_FORMAT = ">Q"
+KEY_SIZE = struct.calcsize(KEY_FORMAT)
+
+
+# Pack a move into 15 bits: from square, to square and promotion piece type
+def encode_move(move: chess.Move) -> int:
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code: int) -> chess.Move:
+    return chess.Move(code & 0x3F, code >> 6 & 0x3F, (code >> 12) or None)
+
+
+def unpack_keys(packed: bytes | None) -> list[int]:
+    if not packed:
+        return []
+    return [key for (key,) in struct.iter_unpack(KEY_FORMAT, packed)]
+
+
+def pack_keys(keys: list[int]) -> bytes:
+    return struct.pack(f">{len(keys)}Q", *keys)
+
+
+# Push a move and keep the game's repetition window up to date. Returns the
+# (ply, encoded move) record to append to the history.
+def push_move(game, board: chess.Board, move: chess.Move) -> tuple[int, int]:
+    ply = board.ply()
+    if board.is_zeroing(move):
+        keys = []  # Earlier positions can never occur again
+    else:
+        keys = unpack_keys(game.repetition_keys) or [chess.polyglot.zobrist_hash(board)]
+    board.push(move)
+    keys.append(chess.polyglot.zobrist_hash(board))
+    game.fen = board.fen()
+    game.repetition_keys = pack_keys(keys)
+    return ply, encode_move(move)
+
+
+# Threefold repetition of the current position, from the repetition window
+def is_threefold_repetition(game) -> bool:
+    keys = unpack_keys(game.repetition_keys)
+    return bool(keys) and keys.count(keys[-1]) >= 3
+
+
+# Batched append; replaying an already stored ply is a no-op
+async def append_moves(db: AsyncSession, game_id: int, moves: list[tuple[int, int]]):
+    if not moves:
+        return
+    stmt = insert(GameMove).on_conflict_do_nothing(
+        index_elements=[GameMove.game_id, GameMove.ply]
+    )
+    await db.execute(
+        stmt, [{"game_id": game_id, "ply": ply, "move": code} for ply, code in moves]
+    )
@@ -0,0 +1,125 @@
+import io
+from datetime import datetime
+from typing import NamedTuple
+import chess
+import chess.pgn
+from app.core.constants import GameType, Winner
+from app.services.move_history import decode_move, encode_move
+
+RESULTS = {
+    Winner.WHITE: "1-0",
+    Winner.BLACK: "0-1",
+    Winner.AI: "0-1",
+    Winner.DRAW: "1/2-1/2",
+    Winner.ONGOING: "*",
+}
+
+
+# Replay an encoded history from the start, or None if a move does not fit
+def _replay(moves: list[int]) -> chess.Board | None:
+    board = chess.Board()
+    for code in moves:
+        try:
+            move = decode_move(code)
+        except ValueError:
+            return None
+        if not board.is_legal(move):
+            return None
+        board.push(move)
+    return board
+
+
+# One game as PGN text. `moves` are the encoded history from ply `first_ply`
+# (0 = White's first move). When the history is missing, starts later (the
+# game was under way when the history was introduced) or does not replay, the
+# game is exported from its last position, with SetUp and FEN headers.
+def game_to_pgn(
+    game,
+    moves: list[int] | None,
+    white_name: str | None,
+    black_name: str | None,
+    first_ply: int | None = 0,
+) -> str:
+    board = _replay(moves) if moves and first_ply == 0 else None
+    if board is None:
+        board = chess.Board() if game.fen == "startpos" else chess.Board(game.fen)
+    pgn = chess.pgn.Game.from_board(board)
+
+    created_at: datetime = game.created_at
+    if game.game_type == GameType.AI:
+        black_name = f"Stockfish ({game.ai_difficulty.value})"
+    pgn.headers["Event"] = f"Chess Arena {game.game_type.value} game"
+    pgn.headers["Site"] = "Chess Arena"
+    pgn.headers["Date"] = (
+        created_at.strftime("%Y.%m.%d") if created_at else "????.??.??"
+    )
+    pgn.headers["Round"] = "-"
+    pgn.headers["White"] = white_name or "?"
+    pgn.headers["Black"] = black_name or "?"
+    pgn.headers["Result"] = RESULTS[game.winner]
+    pgn.headers["GameId"] = str(game.id)
+    if game.time_base is not None:
+        pgn.headers["TimeControl"] = f"{game.time_base}+{game.time_increment}"
+    return str(pgn) + "\n\n"
+
+
+RESULT_WINNERS = {"1-0": Winner.WHITE, "0-1": Winner.BLACK, "1/2-1/2": Winner.DRAW}
+
+
+class ParsedGame(NamedTuple):
+    white: str | None
+    black: str | None
+    winner: Winner
+    fen: str
+    created_at: datetime | None
+    time_base: int | None
+    time_increment: int
+    moves: list[int]
+
+
+def _parse_date(value: str | None) -> datetime | None:
+    try:
+        return datetime.strptime(value, "%Y.%m.%d")
+    except (TypeError, ValueError):
+        return None  # Missing or partly unknown, e.g. "2021.??.??"
+
+
+def _parse_time_control(value: str | None) -> tuple[int | None, int]:
+    time_base, _, time_increment = (value or "").partition("+")
+    if not time_base.isdigit():
+        return None, 0
+    return int(time_base), int(time_increment) if time_increment.isdigit() else 0
+
+
+# Parse a chunk of PGN text into games for the importer (runs in worker
+# processes). Unfinished and malformed games, and games from a set-up
+# position, are skipped; returns the games and how many were skipped.
+def parse_games(text: str) -> tuple[list[ParsedGame], int]:
+    games, skipped = [], 0
+    stream = io.StringIO(text)
+    while True:
+        pgn = chess.pgn.read_game(stream)
+        if pgn is None:
+            break
+        headers = pgn.headers
+        winner = RESULT_WINNERS.get(headers.get("Result"))
+        if pgn.errors or winner is None or "FEN" in headers:
+            skipped += 1
+            continue
+        board = chess.Board()
+        moves = []
+        for move in pgn.mainline_moves():
+            moves.append(encode_move(move))
+            board.push(move)
+        games.append(
+            ParsedGame(
+                headers.get("White"),
+                headers.get("Black"),
+                winner,
+                board.fen(),
+                _parse_date(headers.get("Date")),
+                *_parse_time_control(headers.get("TimeControl")),
+                moves,
+            )
+        )
+    return games, skipped
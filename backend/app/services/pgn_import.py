@@ -0,0 +1,235 @@
+import asyncio
+import codecs
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.core.constants import GameStatus, GameType
+from app.core.database import SessionLocal
+from app.models.game import Game
+from app.models.move import GameMove
+from app.models.user import User
+from app.services.pgn import ParsedGame, parse_games
+
+READ_SIZE = 1024 * 1024
+PLAYER_CACHE_SIZE = 100000
+PROGRESS_INTERVAL = 10.0
+
+
+def _spawn_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+# Split PGN bytes into chunks of whole games, reading a block at a time. A
+# game starts at the first tag line ("[Event ...") after its predecessor's
+# movetext; "[%clk ...]" annotations inside comments are not tag lines.
+async def _chunks(
+    read: Callable[[int], Awaitable[bytes]], batch: int
+) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    chunk, games, in_tags, rest = [], 0, False, ""
+    while True:
+        data = await read(READ_SIZE)
+        lines = (rest + decoder.decode(data, final=not data)).split("\n")
+        rest = lines.pop() if data else ""
+        for line in lines:
+            if line[:1] == "[" and line[1:2].isalpha():
+                if not in_tags:
+                    in_tags = True
+                    if games == batch:
+                        yield "".join(chunk)
+                        chunk, games = [], 0
+                    games += 1
+            elif line.strip():
+                in_tags = False
+            chunk.append(line + "\n")
+        if not data:
+            break
+    if games:
+        yield "".join(chunk)
+
+
+class PgnImporter:
+    """Bulk import of finished games from PGN.
+
+    The input is read block by block and cut into chunks of whole games,
+    which a process pool parses in parallel. At most two chunks per worker
+    are in flight, so memory stays bounded whatever the file size. Parsed
+    chunks are inserted in order, one executemany for the games and one for
+    their moves, committing per chunk.
+
+    Players are matched by username. With an owner (an upload), only the
+    owner is linked, as `player_name`, and games without them are skipped.
+    Otherwise (seeding) names map to existing accounts, and games where
+    neither player has one are skipped.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        batch: int,
+        owner: User | None = None,
+        player_name: str | None = None,
+    ):
+        self.workers = workers
+        self.batch = batch
+        self.owner = owner
+        self.player_name = player_name
+        self._players: dict[str, str | None] = {}
+        self.counters = {"imported": 0, "skipped": 0, "moves": 0}
+
+    async def _player_ids(self, names: set[str], db: AsyncSession):
+        if self.owner is not None:
+            return {self.player_name: self.owner.id}
+        if len(self._players) > PLAYER_CACHE_SIZE:
+            self._players.clear()
+        missing = names - self._players.keys()
+        if missing:
+            self._players.update(dict.fromkeys(missing))
+            result = await db.execute(
+                select(User.username, User.id).where(User.username.in_(missing))
+            )
+            self._players.update(result.tuples().all())
+        return self._players
+
+    async def _insert(self, games: list[ParsedGame], skipped: int, db: AsyncSession):
+        self.counters["skipped"] += skipped
+        names = {name for game in games for name in (game.white, game.black)}
+        player_ids = await self._player_ids(names - {None}, db)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        rows, kept = [], []
+        for game in games:
+            white_id = player_ids.get(game.white)
+            black_id = player_ids.get(game.black)
+            if white_id is None and black_id is None:
+                self.counters["skipped"] += 1
+                continue
+            rows.append(
+                {
+                    "player_white_id": white_id,
+                    "player_black_id": black_id,
+                    "game_type": GameType.IMPORTED,
+                    "fen": game.fen,
+                    "status": GameStatus.FINISHED,
+                    "winner": game.winner,
+                    "time_base": game.time_base,
+                    "time_increment": game.time_increment,
+                    "created_at": game.created_at or now,
+                }
+            )
+            kept.append(game)
+        if not rows:
+            return
+
+        result = await db.execute(
+            insert(Game).returning(Game.id, sort_by_parameter_order=True), rows
+        )
+        moves = [
+            {"game_id": game_id, "ply": ply, "move": code}
+            for game_id, game in zip(result.scalars().all(), kept)
+            for ply, code in enumerate(game.moves)
+        ]
+        if moves:
+            await db.execute(insert(GameMove), moves)
+        await db.commit()
+        self.counters["imported"] += len(rows)
+        self.counters["moves"] += len(moves)
+
+    # Import everything `read` returns, parsing on `pool` if given (shared with
+    # other imports) or on a pool of its own
+    async def run(
+        self,
+        read: Callable[[int], Awaitable[bytes]],
+        pool: ProcessPoolExecutor | None = None,
+    ) -> dict:
+        loop = asyncio.get_running_loop()
+        started = last_report = time.perf_counter()
+        pending = deque()
+        own_pool = pool is None
+        if own_pool:
+            pool = _spawn_pool(self.workers)
+        try:
+            async with SessionLocal() as db:
+                async for chunk in _chunks(read, self.batch):
+                    pending.append(loop.run_in_executor(pool, parse_games, chunk))
+                    if len(pending) < 2 * self.workers:
+                        continue
+                    await self._insert(*await pending.popleft(), db)
+                    if time.perf_counter() - last_report >= PROGRESS_INTERVAL:
+                        last_report = time.perf_counter()
+                        print(f"PGN import: {self.stats(started)}", flush=True)
+                while pending:
+                    await self._insert(*await pending.popleft(), db)
+        finally:
+            for future in pending:
+                future.cancel()
+            if own_pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+        return self.stats(started)
+
+    def stats(self, started: float) -> dict:
+        seconds = time.perf_counter() - started
+        return {
+            **self.counters,
+            "seconds": round(seconds, 1),
+            "rows_per_second": round(self.counters["imported"] / seconds, 1),
+        }
+
+
+class PgnUploads:
+    """Admission and parser processes for PGN uploads.
+
+    All uploads of the process parse on one pool of `workers` processes,
+    started with the first upload. At most `max_uploads` run at a time;
+    further ones are turned away with a 503 instead of queueing behind them.
+    A pool broken by a crashed worker is replaced for the next upload.
+    """
+
+    def __init__(self, workers: int, max_uploads: int):
+        self.workers = workers
+        self.max_uploads = max_uploads
+        self._pool: ProcessPoolExecutor | None = None
+        self._active = 0
+        self.counters = {"uploads": 0, "rejected": 0}
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[ProcessPoolExecutor]:
+        if self._active >= self.max_uploads:
+            self.counters["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many imports in progress, please retry later",
+            )
+        if self._pool is None:
+            self._pool = _spawn_pool(self.workers)
+        self._active += 1
+        self.counters["uploads"] += 1
+        try:
+            yield self._pool
+        except BrokenProcessPool:
+            self.close()
+            raise
+        finally:
+            self._active -= 1
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {**self.counters, "active": self._active}
+
+
+pgn_uploads = PgnUploads(
+    workers=settings.PGN_IMPORT_WORKERS, max_uploads=settings.PGN_IMPORT_MAX_UPLOADS
+)
@@ -0,0 +1,128 @@
+import asyncio
+import time
+import chess
+import chess.engine
+from app.core.config import settings
+from app.core.engine_backend import profile_limit, run_search
+from app.core.engine_pool import ENGINE_ERRORS, EnginePool
+
+
+class PonderSession:
+    def __init__(self, expected_fen: str, task: asyncio.Task):
+        self.expected_fen = expected_fen
+        self.task = task
+        self.started_at = time.monotonic()
+
+
+class Ponderer:
+    """Searches the expected player reply while the player is thinking.
+
+    After an engine reply, the position after the engine's predicted player
+    move is searched with a spare engine from the game's pool. If the player
+    then plays that move, the AI reply is taken from the pondered search
+    instead of starting a new one. Sessions are capped per process and only
+    start while the pool keeps an idle engine for regular searches.
+    """
+
+    def __init__(self, enabled: bool, max_sessions: int, result_ttl: int):
+        self.enabled = enabled
+        self.max_sessions = max_sessions
+        self.result_ttl = result_ttl
+        self._sessions: dict[int, PonderSession] = {}
+        self.counters = {"started": 0, "hits": 0, "misses": 0}
+
+    @property
+    def active(self) -> int:
+        return sum(1 for session in self._sessions.values() if not session.task.done())
+
+    # Drop finished sessions nobody came back for
+    def _prune(self):
+        now = time.monotonic()
+        for game_id, session in list(self._sessions.items()):
+            if session.task.done() and now - session.started_at > self.result_ttl:
+                del self._sessions[game_id]
+
+    @staticmethod
+    async def _search(
+        engine_pool: EnginePool,
+        engine: chess.engine.UciProtocol,
+        board: chess.Board,
+        profile: dict,
+    ) -> chess.Move | None:
+        try:
+            result = await asyncio.wait_for(
+                run_search(engine, board, profile_limit(profile), profile),
+                timeout=settings.STOCKFISH_SEARCH_TIMEOUT,
+            )
+        except ENGINE_ERRORS:
+            await engine_pool.replace(engine)
+            return None
+        engine_pool.release(engine)
+        return result.move
+
+    def start(
+        self,
+        game_id: int,
+        board: chess.Board,
+        ponder_move: chess.Move | None,
+        engine_pool: EnginePool,
+        profile: dict,
+    ):
+        # A new reply makes any earlier session for the game stale
+        previous = self._sessions.pop(game_id, None)
+        if previous is not None:
+            previous.task.cancel()
+        if not self.enabled or ponder_move is None or not board.is_legal(ponder_move):
+            return
+        self._prune()
+        if self.active >= self.max_sessions:
+            return
+        engine = engine_pool.try_acquire()
+        if engine is None:
+            return
+
+        pondered = board.copy(stack=False)
+        pondered.push(ponder_move)
+        task = asyncio.create_task(self._search(engine_pool, engine, pondered, profile))
+
+        # Cancelled searches hand their engine back, including ones cancelled
+        # before they got to run
+        def release_if_cancelled(task: asyncio.Task):
+            if task.cancelled():
+                engine_pool.release(engine)
+
+        task.add_done_callback(release_if_cancelled)
+        self._sessions[game_id] = PonderSession(pondered.fen(), task)
+        self.counters["started"] += 1
+
+    # Reply from the pondered search if the player made the expected move
+    async def take(self, game_id: int, board: chess.Board) -> chess.Move | None:
+        session = self._sessions.pop(game_id, None)
+        if session is None:
+            return None
+        if session.expected_fen != board.fen():
+            session.task.cancel()
+            self.counters["misses"] += 1
+            return None
+
+        move = await session.task
+        if move is None or not board.is_legal(move):
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return move
+
+    async def close(self):
+        tasks = [session.task for session in self._sessions.values()]
+        self._sessions.clear()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {**self.counters, "active": self.active}
+
+
+ponderer = Ponderer(
+    enabled=settings.AI_PONDER_ENABLED,
+    max_sessions=settings.AI_PONDER_MAX_SESSIONS,
+    result_ttl=settings.AI_PONDER_RESULT_TTL,
+)
@@ -0,0 +1,102 @@
+import asyncio
+from redis.asyncio import Redis
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+# Always subscribed, so the connection has a subscription to read from even
+# while no socket is open
+HUB_CHANNEL = "pubsub_hub"
+
+
+class PubSubHub:
+    """One Redis pubsub connection shared by every WebSocket of the process.
+
+    Each channel is subscribed once, when its first local subscriber arrives,
+    and unsubscribed when its last one leaves. A single reader task fans each
+    message out to the subscribers' queues, so Redis connections grow with
+    the number of processes rather than the number of sockets.
+
+    Queues are bounded. A subscriber that falls that far behind is dropped:
+    its queue is emptied and gets a None, after which nothing more is
+    delivered to it.
+    """
+
+    def __init__(self, redis: Redis, queue_size: int):
+        self.redis = redis
+        self.queue_size = queue_size
+        self._pubsub = redis.pubsub()
+        self._channels: dict[str, set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.counters = {"messages": 0, "delivered": 0, "dropped": 0}
+
+    async def subscribe(self, channel: str) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_size)
+        async with self._lock:
+            subscribers = self._channels.get(channel)
+            if subscribers is None:
+                await self._pubsub.subscribe(channel)
+                subscribers = self._channels[channel] = set()
+            subscribers.add(queue)
+        return queue
+
+    async def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        async with self._lock:
+            subscribers = self._channels.get(channel)
+            if subscribers is None:
+                return
+            subscribers.discard(queue)  # Already gone if it was dropped
+            if not subscribers:
+                del self._channels[channel]
+                await self._pubsub.unsubscribe(channel)
+
+    def _drop(self, channel: str, queue: asyncio.Queue):
+        self._channels[channel].discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+        self.counters["dropped"] += 1
+
+    def _fan_out(self, channel: str, data: str):
+        self.counters["messages"] += 1
+        for queue in list(self._channels.get(channel, ())):
+            try:
+                queue.put_nowait(data)
+                self.counters["delivered"] += 1
+            except asyncio.QueueFull:
+                self._drop(channel, queue)
+
+    async def _run(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=None)
+            except Exception as e:
+                # The client reconnects and resubscribes on the next read
+                print(f"Pubsub hub read failed: {e}", flush=True)
+                await asyncio.sleep(1)
+                continue
+            if message is not None and message["type"] == "message":
+                self._fan_out(message["channel"], message["data"])
+
+    async def start(self):
+        await self._pubsub.subscribe(HUB_CHANNEL)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._pubsub.aclose()
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "channels": len(self._channels),
+            "subscribers": sum(len(queues) for queues in self._channels.values()),
+        }
+
+
+pubsub_hub = PubSubHub(redis=redis_client, queue_size=settings.WS_QUEUE_SIZE)
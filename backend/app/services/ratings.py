@@ -0,0 +1,98 @@
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.core.constants import (
+    AI_RATINGS,
+    RATING_K,
+    RATING_K_PROVISIONAL,
+    RATING_PROVISIONAL_GAMES,
+    GameType,
+    Winner,
+)
+from app.models.user import User
+
+# (rating, rated games) of a player
+Rating = tuple[float, int]
+
+WHITE_SCORES = {Winner.WHITE: 1.0, Winner.DRAW: 0.5, Winner.BLACK: 0.0, Winner.AI: 0.0}
+
+
+def expected_score(rating: float, opponent: float) -> float:
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+
+def _updated(player: Rating, opponent: float, score: float) -> Rating:
+    rating, rated_games = player
+    k = RATING_K_PROVISIONAL if rated_games < RATING_PROVISIONAL_GAMES else RATING_K
+    return rating + k * (score - expected_score(rating, opponent)), rated_games + 1
+
+
+# New ratings of both players after a finished game (Elo). In AI games only
+# White is a player and the engine has a fixed rating per difficulty.
+def rate_game(
+    game, white: Rating, black: Rating | None
+) -> tuple[Rating, Rating | None]:
+    score = WHITE_SCORES[game.winner]
+    if game.game_type == GameType.AI:
+        return _updated(white, AI_RATINGS[game.ai_difficulty], score), None
+    return _updated(white, black[0], score), _updated(black, white[0], 1 - score)
+
+
+def is_rated(game) -> bool:
+    if game.winner not in WHITE_SCORES or game.game_type == GameType.IMPORTED:
+        return False
+    return game.game_type == GameType.AI or game.player_black_id is not None
+
+
+# Update the players' ratings in the transaction that finishes the game: one
+# locked read of the players and one batched update, whatever the history
+async def apply_ratings(game, db: AsyncSession):
+    await apply_ratings_batch([game], db)
+
+
+# Same for several games finished together, applied in the given order
+async def apply_ratings_batch(games: list, db: AsyncSession):
+    games = [game for game in games if is_rated(game)]
+    if not games:
+        return
+    player_ids = {game.player_white_id for game in games}
+    player_ids.update(
+        game.player_black_id for game in games if game.game_type != GameType.AI
+    )
+    # Locked in id order so concurrent finishes cannot deadlock
+    result = await db.execute(
+        select(User.id, User.rating, User.rated_games)
+        .where(User.id.in_(player_ids))
+        .order_by(User.id)
+        .with_for_update()
+    )
+    ratings = {row.id: (row.rating, row.rated_games) for row in result.all()}
+    changed = {}
+    for game in games:
+        white_id, black_id = game.player_white_id, game.player_black_id
+        if white_id not in ratings or (
+            game.game_type != GameType.AI and black_id not in ratings
+        ):
+            continue
+        white, black = rate_game(game, ratings[white_id], ratings.get(black_id))
+        ratings[white_id] = changed[white_id] = white
+        if black is not None:
+            ratings[black_id] = changed[black_id] = black
+    if changed:
+        await save_ratings(changed, db)
+
+
+async def save_ratings(ratings: dict[str, Rating], db: AsyncSession):
+    users = User.__table__
+    stmt = (
+        update(users)
+        .where(users.c.id == bindparam("b_id"))
+        .values(rating=bindparam("b_rating"), rated_games=bindparam("b_rated_games"))
+    )
+    await db.execute(
+        stmt,
+        [
+            {"b_id": user_id, "b_rating": rating, "b_rated_games": rated_games}
+            for user_id, (rating, rated_games) in ratings.items()
+        ],
+    )
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from datetime import timedelta
+from sqlalchemy import case, delete, func, literal, or_, update
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.core.constants import GameStatus, GameType, Winner
+from app.core.database import SessionLocal
+from app.models.game import Game
+from app.services.game_state import game_state_store
+from app.services.ratings import apply_ratings_batch
+
+
+class GameReaper:
+    """Periodically clears out games nobody is coming back to.
+
+    WAITING games that never got an opponent are deleted and ONGOING games
+    without a move for too long are finished as a (rated) loss for the side
+    to move, who abandoned them. Both are found through the (status,
+    updated_at) index and handled in batches of row-locked ids; rows locked by
+    another instance are skipped and every statement re-checks the status, so
+    running it on several instances at once is safe.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        interval: float,
+        waiting_ttl: int,
+        ongoing_ttl: int,
+        batch: int,
+    ):
+        self.enabled = enabled
+        self.interval = interval
+        self.waiting_ttl = waiting_ttl
+        self.ongoing_ttl = ongoing_ttl
+        self.batch = batch
+        self._task: asyncio.Task | None = None
+        self.counters = {"runs": 0, "waiting_deleted": 0, "ongoing_finished": 0}
+        self.last_run_ms = 0.0
+
+    @staticmethod
+    def _stale_ids(status: GameStatus, ttl: int, batch: int):
+        # Compared against the database clock that wrote updated_at
+        cutoff = func.now() - timedelta(seconds=ttl)
+        return (
+            select(Game.id)
+            .where(Game.status == status, Game.updated_at < cutoff)
+            .limit(batch)
+            .with_for_update(skip_locked=True)
+        )
+
+    # Delete one batch of stale WAITING games; returns how many were deleted
+    async def reap_waiting(self) -> int:
+        stmt = (
+            delete(Game)
+            .where(
+                Game.id.in_(
+                    self._stale_ids(GameStatus.WAITING, self.waiting_ttl, self.batch)
+                ),
+                Game.status == GameStatus.WAITING,
+            )
+            .returning(Game.id)
+            .execution_options(synchronize_session=False)
+        )
+        async with SessionLocal() as db:
+            result = await db.execute(stmt)
+            game_ids = result.scalars().all()
+            await db.commit()
+        self.counters["waiting_deleted"] += len(game_ids)
+        return len(game_ids)
+
+    # Winner of an abandoned game: whoever was not to move (in AI games the
+    # engine plays Black)
+    @staticmethod
+    def _abandoned_winner():
+        winner = Game.__table__.c.winner.type
+        white_to_move = or_(
+            Game.fen == "startpos", func.split_part(Game.fen, " ", 2) == "w"
+        )
+        return case(
+            (~white_to_move, literal(Winner.WHITE, winner)),
+            (Game.game_type == GameType.AI, literal(Winner.AI, winner)),
+            else_=literal(Winner.BLACK, winner),
+        )
+
+    # Finish one batch of abandoned ONGOING games; returns how many were finished
+    async def reap_ongoing(self) -> int:
+        stmt = (
+            update(Game)
+            .where(
+                Game.id.in_(
+                    self._stale_ids(GameStatus.ONGOING, self.ongoing_ttl, self.batch)
+                ),
+                Game.status == GameStatus.ONGOING,
+            )
+            .values(
+                status=GameStatus.FINISHED,
+                winner=self._abandoned_winner(),
+                version=Game.version + 1,
+            )
+            .returning(
+                Game.id,
+                Game.game_type,
+                Game.ai_difficulty,
+                Game.player_white_id,
+                Game.player_black_id,
+                Game.winner,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        async with SessionLocal() as db:
+            result = await db.execute(stmt)
+            games = result.all()
+            await apply_ratings_batch(games, db)
+            await db.commit()
+        game_ids = [game.id for game in games]
+        await game_state_store.evict(game_ids)
+        self.counters["ongoing_finished"] += len(game_ids)
+        return len(game_ids)
+
+    async def run_once(self):
+        start = time.perf_counter()
+        while await self.reap_waiting() == self.batch:
+            pass
+        while await self.reap_ongoing() == self.batch:
+            pass
+        self.counters["runs"] += 1
+        self.last_run_ms = (time.perf_counter() - start) * 1000
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Game reaper run failed: {e}", flush=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "last_run_ms": round(self.last_run_ms, 1),
+            **self.counters,
+        }
+
+
+game_reaper = GameReaper(
+    enabled=settings.REAPER_ENABLED,
+    interval=settings.REAPER_INTERVAL_SECONDS,
+    waiting_ttl=settings.REAPER_WAITING_TTL_SECONDS,
+    ongoing_ttl=settings.REAPER_ONGOING_TTL_SECONDS,
+    batch=settings.REAPER_BATCH,
+)
@@ -0,0 +1,75 @@
+from functools import lru_cache
+import chess
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.constants import GameStatus, GameType, Winner
+from app.services.move_history import is_threefold_repetition
+
+
+# Legal moves depend only on the position, so the clocks are left out of the key
+def _position_key(fen: str) -> str:
+    if fen == "startpos":
+        fen = chess.STARTING_FEN
+    return " ".join(fen.split()[:4])
+
+
+@lru_cache(maxsize=settings.LEGAL_MOVES_CACHE_SIZE)
+def _legal_moves(position: str) -> tuple[chess.Move, ...]:
+    return tuple(chess.Board(f"{position} 0 1").legal_moves)
+
+
+def legal_moves(fen: str) -> tuple[chess.Move, ...]:
+    return _legal_moves(_position_key(fen))
+
+
+def legal_moves_stats() -> dict:
+    info = _legal_moves.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+
+
+# Parse a move given in UCI ("e2e4", "e7e8q") or SAN ("e4", "exd5", "O-O")
+def parse_move(board: chess.Board, move: str) -> chess.Move:
+    try:
+        uci_move = chess.Move.from_uci(move)
+    except ValueError:
+        uci_move = None
+    if uci_move is not None and uci_move in legal_moves(board.fen()):
+        return uci_move
+    try:
+        san_move = board.parse_san(move)
+    except ValueError:
+        san_move = None
+    # SAN also reads "--" and "0000" as a null move, which would pass the turn
+    if san_move is None or san_move not in legal_moves(board.fen()):
+        raise HTTPException(status_code=400, detail="Invalid move format")
+    return san_move
+
+
+# Winner if the position ends the game, else None. The legal moves are
+# generated once (and cached) for checkmate, stalemate and the fifty-move rule.
+def get_outcome(game, board: chess.Board) -> Winner | None:
+    moves = legal_moves(board.fen())
+    if not moves:
+        if not board.is_check():
+            return Winner.DRAW  # Stalemate
+        if board.turn == chess.BLACK:
+            return Winner.WHITE
+        return Winner.AI if game.game_type == GameType.AI else Winner.BLACK
+    if board.is_insufficient_material() or is_threefold_repetition(game):
+        return Winner.DRAW
+    # Fifty-move rule, including a claim with the move that reaches it
+    if board.halfmove_clock >= 100 or (
+        board.halfmove_clock >= 99 and any(not board.is_zeroing(move) for move in moves)
+    ):
+        return Winner.DRAW
+    return None
+
+
+# Finish the game if the position ends it; returns whether it did
+def finish_if_over(game, board: chess.Board) -> bool:
+    winner = get_outcome(game, board)
+    if winner is None:
+        return False
+    game.status = GameStatus.FINISHED
+    game.winner = winner
+    return True
@@ -1,13 +1,22 @@
-from typing import List
+from datetime import date, timedelta
+from typing import AsyncIterator, List
 from fastapi import HTTPException, status
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import aliased
 from sqlalchemy.sql import case
 from sqlalchemy.future import select
+from app.core.database import SessionLocal
 from app.models.game import Game
+from app.models.move import GameMove
 from app.core.constants import GameType, Winner
 from app.schemas.users import RecentGameResponse, UserStatsResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
 from app.services.auth import get_user
+from app.services.pgn import game_to_pgn
+
+PGN_EXPORT_BATCH = 500
 
 
 async def get_player_stats(username: str, db: AsyncSession) -> UserStatsResponse:
@@ -17,9 +26,11 @@ async def get_player_stats(username: str, db: AsyncSession) -> UserStatsResponse
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
     user_id = db_user.id
+    # Imported games are the uploader's own claim; only games played here count
     result = await db.execute(
         select(Game).where(
-            (Game.player_white_id == user_id) | (Game.player_black_id == user_id)
+            (Game.player_white_id == user_id) | (Game.player_black_id == user_id),
+            Game.game_type != GameType.IMPORTED,
         )
     )
     games = result.scalars().all()
@@ -130,7 +141,10 @@ async def get_recent_games_details(
             User,
             (User.id == opponent_alias),
         )
-        .where((Game.player_white_id == user_id) | (Game.player_black_id == user_id))
+        .where(
+            (Game.player_white_id == user_id) | (Game.player_black_id == user_id),
+            Game.game_type != GameType.IMPORTED,
+        )
         .order_by(Game.created_at.desc())
         .limit(5)
     )
@@ -186,3 +200,79 @@ async def get_recent_games_details(
         )
         for game, opponent_username, opponent_id in games
     ]
+
+
+async def export_games_pgn(
+    username: str,
+    db: AsyncSession,
+    since: date | None = None,
+    until: date | None = None,
+    game_type: GameType | None = None,
+) -> AsyncIterator[str]:
+    db_user = await get_user(username=username, db=db)
+    if not db_user or not db_user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    return stream_games_pgn(db_user.id, since, until, game_type)
+
+
+# Stream a player's games (oldest first) as PGN in constant memory: one
+# server-side cursor fetched in batches, with each game's moves aggregated in
+# the same query. Uses its own session, as it outlives the request handler.
+async def stream_games_pgn(
+    user_id: str,
+    since: date | None,
+    until: date | None,
+    game_type: GameType | None,
+) -> AsyncIterator[str]:
+    white = aliased(User)
+    black = aliased(User)
+    moves = (
+        select(func.array_agg(aggregate_order_by(GameMove.move, GameMove.ply)))
+        .where(GameMove.game_id == Game.id)
+        .scalar_subquery()
+    )
+    first_ply = (
+        select(func.min(GameMove.ply))
+        .where(GameMove.game_id == Game.id)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(
+            Game.id,
+            Game.fen,
+            Game.game_type,
+            Game.ai_difficulty,
+            Game.winner,
+            Game.time_base,
+            Game.time_increment,
+            Game.created_at,
+            moves.label("moves"),
+            first_ply.label("first_ply"),
+            white.username.label("white_name"),
+            black.username.label("black_name"),
+        )
+        .outerjoin(white, white.id == Game.player_white_id)
+        .outerjoin(black, black.id == Game.player_black_id)
+        .where(or_(Game.player_white_id == user_id, Game.player_black_id == user_id))
+    )
+    if since is not None:
+        stmt = stmt.where(Game.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(Game.created_at < until + timedelta(days=1))
+    if game_type is not None:
+        stmt = stmt.where(Game.game_type == game_type)
+    stmt = stmt.order_by(Game.created_at, Game.id).execution_options(
+        yield_per=PGN_EXPORT_BATCH
+    )
+
+    async with SessionLocal() as db:
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            yield "".join(
+                game_to_pgn(
+                    row, row.moves, row.white_name, row.black_name, row.first_ply
+                )
+                for row in rows
+            )
@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+import chess
+import fakeredis.aioredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.v1.endpoints import game as game_endpoints
+from app.core.constants import GameStatus, GameType, Winner
+from app.dependencies import get_db, get_redis_client
+from app.services import game as game_service
+from app.services.auth import get_current_active_user
+from app.services.game_state import HotGame
+
+
+@pytest.fixture
+def game(monkeypatch) -> HotGame:
+    game = HotGame(
+        id=1,
+        player_white_id="white",
+        player_black_id=None,
+        game_type=GameType.AI,
+        ai_difficulty=None,
+        fen=chess.STARTING_FEN,
+        status=GameStatus.ONGOING,
+        winner=Winner.ONGOING,
+    )
+
+    async def load_game(game_id, game_type, db):
+        return game
+
+    monkeypatch.setattr(game_service, "load_game", load_game)
+    return game
+
+
+@pytest.fixture
+def scheduled(monkeypatch) -> list[int]:
+    scheduled = []
+
+    async def play_ai_reply(game_id, app, redis_client):
+        scheduled.append(game_id)
+
+    monkeypatch.setattr(game_endpoints, "play_ai_reply", play_ai_reply)
+    return scheduled
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(game_endpoints.router, prefix="/api/v1")
+
+    async def get_db_override():
+        yield None
+
+    async def get_redis_override():
+        yield fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+    app.dependency_overrides[get_db] = get_db_override
+    app.dependency_overrides[get_redis_client] = get_redis_override
+    app.dependency_overrides[get_current_active_user] = lambda: SimpleNamespace(
+        id="white"
+    )
+    return TestClient(app)
+
+
+def move(client: TestClient, uci: str):
+    return client.post(
+        "/api/v1/game/ai/move",
+        json={"game_id": 1, "move": uci, "async_reply": True},
+    )
+
+
+def test_stalled_game_reschedules_the_ai_reply(game, scheduled, client):
+    board = chess.Board()
+    board.push_uci("e2e4")
+    game.fen = board.fen()
+
+    response = move(client, "d2d4")
+
+    assert response.status_code == 409
+    assert scheduled == [1]
+
+
+def test_illegal_move_on_players_turn_is_rejected(game, scheduled, client):
+    response = move(client, "e2e5")
+
+    assert response.status_code == 400
+    assert scheduled == []
+
+
+def test_one_ai_reply_per_game_at_a_time(monkeypatch):
+    calls = []
+
+    async def search(game_id, app, redis_client):
+        calls.append(game_id)
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(game_service, "_play_ai_reply", search)
+
+    async def main():
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        await asyncio.gather(
+            game_service.play_ai_reply(1, None, redis),
+            game_service.play_ai_reply(1, None, redis),
+        )
+        await game_service.play_ai_reply(1, None, redis)
+        return await redis.exists(game_service._ai_reply_key(1))
+
+    assert asyncio.run(main()) == 0
+    assert calls == [1, 1]
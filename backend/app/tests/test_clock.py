@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+import chess
+import pytest
+from app.core.constants import GameStatus, GameType, Winner
+from app.services import clock
+
+NOW = 1_000_000
+BLACK_TO_MOVE = chess.Board().fen().replace(" w ", " b ")
+LONE_KING = "8/8/8/4k3/8/8/4K2P/8 {} - - 0 1"  # Black has only its king
+
+
+def make_game(fen="startpos", elapsed=0, game_type=GameType.MULTIPLAYER, **fields):
+    values = {
+        "fen": fen,
+        "game_type": game_type,
+        "status": GameStatus.ONGOING,
+        "winner": Winner.ONGOING,
+        "time_base": 60,
+        "time_increment": 2,
+        "clock_started_at": NOW - elapsed,
+        "white_clock_ms": 60000,
+        "black_clock_ms": 60000,
+    }
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+def board_of(game) -> chess.Board:
+    return chess.Board() if game.fen == "startpos" else chess.Board(game.fen)
+
+
+@pytest.fixture(autouse=True)
+def frozen_time(monkeypatch):
+    monkeypatch.setattr(clock, "now_ms", lambda: NOW)
+
+
+@pytest.mark.parametrize(
+    "game, white_ms, black_ms, winner",
+    [
+        # The increment goes to the side that moved, the other clock is untouched
+        (make_game(elapsed=5000), 57000, 60000, Winner.ONGOING),
+        (make_game(fen=BLACK_TO_MOVE, elapsed=5000), 60000, 57000, Winner.ONGOING),
+        (make_game(elapsed=5000, time_increment=0), 55000, 60000, Winner.ONGOING),
+        # Untimed games have no clock to press
+        (make_game(elapsed=5000, time_base=None), 60000, 60000, Winner.ONGOING),
+        # Moving after the flag fell, or just as it falls, loses on time
+        (make_game(elapsed=61000), 0, 60000, Winner.BLACK),
+        (make_game(elapsed=60000), 0, 60000, Winner.BLACK),
+        (make_game(fen=BLACK_TO_MOVE, elapsed=61000), 60000, 0, Winner.WHITE),
+        # ... unless the opponent could never mate
+        (make_game(fen=LONE_KING.format("w"), elapsed=61000), 0, 60000, Winner.DRAW),
+    ],
+)
+def test_press_clock(game, white_ms, black_ms, winner):
+    pressed = clock.press_clock(game, board_of(game))
+    assert pressed is (winner == Winner.ONGOING)
+    assert (game.white_clock_ms, game.black_clock_ms) == (white_ms, black_ms)
+    assert game.winner == winner
+    if pressed and game.time_base is not None:
+        assert game.clock_started_at == NOW  # The opponent's clock runs from now
+
+
+@pytest.mark.parametrize(
+    "game, winner",
+    [
+        (make_game(), Winner.BLACK),
+        (make_game(fen=BLACK_TO_MOVE), Winner.WHITE),
+        (make_game(game_type=GameType.AI), Winner.AI),
+        # The opponent of the side that flagged could never mate
+        (make_game(fen=LONE_KING.format("w")), Winner.DRAW),
+        (make_game(fen=LONE_KING.format("b")), Winner.WHITE),
+    ],
+)
+def test_finish_on_time(game, winner):
+    clock.finish_on_time(game, board_of(game))
+    assert game.status == GameStatus.FINISHED
+    assert game.winner == winner
+
+
+@pytest.mark.parametrize(
+    "game, fell",
+    [
+        (make_game(elapsed=59999), False),
+        (make_game(elapsed=60000), True),
+        (make_game(elapsed=5000, white_clock_ms=4000), True),
+        (make_game(elapsed=90000, time_base=None), False),
+        (make_game(elapsed=90000, status=GameStatus.FINISHED), False),
+    ],
+)
+def test_flag_fell(game, fell):
+    assert clock.flag_fell(game) is fell
@@ -0,0 +1,84 @@
+import asyncio
+import fakeredis.aioredis
+import pytest
+from fastapi import HTTPException
+from app.core.constants import GameStatus, GameType, Winner
+from app.services import game as game_service
+from app.services.game_state import HotGame
+
+
+@pytest.fixture
+def game(monkeypatch) -> HotGame:
+    game = HotGame(
+        id=1,
+        player_white_id="white",
+        player_black_id="black",
+        game_type=GameType.MULTIPLAYER,
+        ai_difficulty=None,
+        fen="startpos",
+        status=GameStatus.ONGOING,
+        winner=Winner.ONGOING,
+    )
+
+    async def load_game(game_id, game_type, db):
+        return game
+
+    async def save_game(game, db, moves=()):
+        pass
+
+    monkeypatch.setattr(game_service, "load_game", load_game)
+    monkeypatch.setattr(game_service, "save_game", save_game)
+    return game
+
+
+def play(game: HotGame, move: str):
+    board = game.board()
+    board.push_san(move)
+    game.fen = board.fen()
+
+
+# Run offers and moves in one event loop, as the fake Redis is bound to it
+def run(game: HotGame, *steps: tuple[str, str]) -> list[bool]:
+    async def main():
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        accepted = []
+        for action, value in steps:
+            if action == "offer":
+                _, result = await game_service.offer_draw(game.id, None, value, redis)
+                accepted.append(result)
+            else:
+                play(game, value)
+        return accepted
+
+    return asyncio.run(main())
+
+
+def test_opponent_accepts_on_their_turn(game):
+    assert run(game, ("offer", "white"), ("move", "e4"), ("offer", "black")) == [
+        False,
+        True,
+    ]
+    assert game.status == GameStatus.FINISHED
+    assert game.winner == Winner.DRAW
+
+
+def test_offer_while_opponent_to_move(game):
+    play(game, "e4")
+    assert run(game, ("offer", "white"), ("offer", "black")) == [False, True]
+
+
+def test_moving_declines_the_offer(game):
+    steps = [("offer", "white"), ("move", "e4"), ("move", "e5"), ("offer", "black")]
+    assert run(game, *steps) == [False, False]
+    assert game.status == GameStatus.ONGOING
+
+
+def test_offering_twice_does_not_accept(game):
+    assert run(game, ("offer", "white"), ("offer", "white")) == [False, False]
+    assert game.status == GameStatus.ONGOING
+
+
+def test_outsider_cannot_offer(game):
+    with pytest.raises(HTTPException) as error:
+        run(game, ("offer", "spectator"))
+    assert error.value.status_code == 403
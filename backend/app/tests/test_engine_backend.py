@@ -0,0 +1,27 @@
+import asyncio
+import json
+import chess
+import fakeredis.aioredis
+from app.core.constants import AIDifficulty
+from app.core.engine_backend import RemoteEngineBackend
+
+
+def test_jobs_are_queued_per_difficulty():
+    async def main():
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        backend = RemoteEngineBackend(redis, "engine:jobs", timeout=1)
+
+        async def worker():
+            _, raw = await redis.blpop("engine:jobs:hard", timeout=1)
+            job = json.loads(raw)
+            await redis.rpush(job["reply_to"], json.dumps({"move": "e2e4"}))
+            return await redis.llen("engine:jobs:easy")
+
+        queued_elsewhere, result = await asyncio.gather(
+            worker(), backend.play(chess.Board(), AIDifficulty.HARD)
+        )
+        return queued_elsewhere, result
+
+    queued_elsewhere, result = asyncio.run(main())
+    assert queued_elsewhere == 0
+    assert result.move == chess.Move.from_uci("e2e4")
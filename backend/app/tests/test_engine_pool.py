@@ -0,0 +1,54 @@
+import asyncio
+import chess
+import chess.engine
+import pytest
+from app.core.constants import AIDifficulty
+from app.core.engine_backend import LocalEngineBackend
+from app.core.engine_pool import EnginePool
+
+
+class FakeEngine:
+    def __init__(self):
+        self.limits = []
+
+    async def play(self, board, limit):
+        self.limits.append(limit)
+        return chess.engine.PlayResult(next(iter(board.legal_moves)), None)
+
+
+def make_pool(engine: FakeEngine, shed_waiters: int) -> EnginePool:
+    engine_pool = EnginePool(path="stockfish", size=1, shed_waiters=shed_waiters)
+    engine_pool._engines.append(engine)
+    engine_pool.release(engine)
+    return engine_pool
+
+
+@pytest.mark.parametrize("shed_waiters, shed", [(4, False), (0, True)])
+def test_shed_searches_are_flagged(shed_waiters, shed):
+    engine = FakeEngine()
+    backend = LocalEngineBackend(
+        {AIDifficulty.HARD: make_pool(engine, shed_waiters)}, search_timeout=1
+    )
+
+    result = asyncio.run(backend.play(chess.Board(), AIDifficulty.HARD))
+
+    assert result.info["shed"] is shed
+    assert (engine.limits[0].time is None) is shed
+
+
+def test_concurrent_replacements_keep_the_pool_size(monkeypatch):
+    engine_pool = EnginePool(path="stockfish", size=2)
+
+    async def spawn():
+        await asyncio.sleep(0.01)
+        return FakeEngine()
+
+    monkeypatch.setattr(engine_pool, "_spawn", spawn)
+
+    async def main():
+        await engine_pool._top_up()
+        crashed = list(engine_pool._engines)
+        await asyncio.gather(*(engine_pool.replace(engine) for engine in crashed))
+
+    asyncio.run(main())
+    assert len(engine_pool._engines) == 2
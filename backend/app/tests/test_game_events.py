@@ -0,0 +1,73 @@
+import asyncio
+import json
+import fakeredis.aioredis
+from app.core.constants import GameStatus, GameType, Winner
+from app.services.game_events import events_since, publish_event
+from app.services.game_state import HotGame
+
+GAME_ID = 9
+
+
+def make_game() -> HotGame:
+    return HotGame(
+        id=GAME_ID,
+        player_white_id="white",
+        player_black_id="black",
+        game_type=GameType.MULTIPLAYER,
+        ai_difficulty=None,
+        fen="startpos",
+        status=GameStatus.ONGOING,
+        winner=Winner.ONGOING,
+    )
+
+
+# Publish `count` events, apply `change` to Redis, then read what a client
+# that last saw `last_seq` gets back
+def replay(count: int, last_seq: int, change=None) -> list[int] | None:
+    async def main():
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        for _ in range(count):
+            await publish_event(redis, make_game(), "move")
+        if change is not None:
+            await change(redis)
+        events = await events_since(GAME_ID, last_seq, redis)
+        if events is None:
+            return None
+        return [json.loads(event)["seq"] for event in events]
+
+    return asyncio.run(main())
+
+
+def test_events_are_numbered_from_one():
+    assert replay(3, 0) == [1, 2, 3]
+
+
+def test_replays_only_missed_events():
+    assert replay(5, 2) == [3, 4, 5]
+
+
+def test_up_to_date_client_gets_nothing():
+    assert replay(3, 3) == []
+
+
+def test_trimmed_events_need_a_snapshot():
+    async def trim(redis):
+        await redis.xtrim(f"game_events:{GAME_ID}", maxlen=2, approximate=False)
+
+    assert replay(5, 3, trim) == [4, 5]
+    assert replay(5, 2, trim) is None
+
+
+def test_expired_log_needs_a_snapshot():
+    async def expire(redis):
+        await redis.delete(f"game_events:{GAME_ID}:seq", f"game_events:{GAME_ID}")
+
+    assert replay(3, 3, expire) is None
+
+
+def test_client_ahead_of_a_restarted_counter_needs_a_snapshot():
+    async def restart(redis):
+        await redis.delete(f"game_events:{GAME_ID}:seq", f"game_events:{GAME_ID}")
+        await publish_event(redis, make_game(), "move")
+
+    assert replay(5, 5, restart) is None
@@ -0,0 +1,197 @@
+import asyncio
+from types import SimpleNamespace
+import fakeredis.aioredis
+import pytest
+from fastapi import HTTPException
+from app.core.constants import GameStatus, GameType, Winner
+from app.models.game import Game
+from app.services import game_state
+from app.services.game_state import DIRTY_KEY, GameStateStore, HotGame, update_game
+
+
+class FakeSession:
+    """Answers every statement with the given row and records rollbacks."""
+
+    def __init__(self, row):
+        self.row = row
+        self.statements = []
+        self.rolled_back = False
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return SimpleNamespace(first=lambda: self.row)
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+def test_update_game_bumps_version():
+    game = Game(id=1, version=3)
+    db = FakeSession(SimpleNamespace(version=4, updated_at=None))
+    asyncio.run(update_game(game, db, fen="startpos"))
+    assert game.version == 4
+    assert not db.rolled_back
+    where = str(db.statements[0].whereclause)
+    assert "games.version" in where
+
+
+def test_update_game_conflict():
+    game = Game(id=1, version=3)
+    db = FakeSession(None)  # No row matched the version read
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(update_game(game, db, fen="startpos"))
+    assert error.value.status_code == 409
+    assert db.rolled_back
+    assert game.version == 3
+
+
+def test_hot_game_redis_round_trip():
+    game = HotGame(
+        id=5,
+        player_white_id="white",
+        player_black_id=None,
+        game_type=GameType.AI,
+        ai_difficulty=None,
+        fen="startpos",
+        status=GameStatus.ONGOING,
+        winner=Winner.ONGOING,
+        repetition_keys=b"\x00" * 8,
+        time_base=300,
+        time_increment=2,
+        white_clock_ms=1000,
+        version=7,
+    )
+    # Redis returns every field as a string
+    data = {field: str(value) for field, value in game.to_redis().items()}
+    assert HotGame.from_redis(data).to_redis() == game.to_redis()
+
+
+def test_hot_game_loads_entries_without_newer_fields():
+    data = {
+        "id": "5",
+        "player_white_id": "white",
+        "player_black_id": "",
+        "game_type": "multiplayer",
+        "ai_difficulty": "",
+        "fen": "startpos",
+        "status": "ongoing",
+        "winner": "ongoing",
+    }
+    game = HotGame.from_redis(data)
+    assert game.repetition_keys == b""
+    assert game.time_base is None
+    assert game.time_increment == 0
+    assert game.version == -1
+
+
+class RecordingSession:
+    """Stands in for an AsyncSession; fails every statement if asked to.
+    Selects return `ids`, updates and inserts are recorded."""
+
+    def __init__(self, fail: bool = False, ids: tuple[int, ...] = ()):
+        self.fail = fail
+        self.ids = list(ids)
+        self.statements = []
+        self.committed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params=None):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        if stmt.is_select:
+            return SimpleNamespace(
+                scalars=lambda: SimpleNamespace(all=lambda: self.ids)
+            )
+        self.statements.append((stmt, params))
+
+    async def commit(self):
+        self.committed = True
+
+    async def rollback(self):
+        pass
+
+
+def make_store(redis) -> GameStateStore:
+    return GameStateStore(
+        redis=redis,
+        enabled=True,
+        local_size=10,
+        ttl=60,
+        flush_interval=1,
+        flush_batch=10,
+    )
+
+
+def make_hot_game(player_black_id: str | None = None) -> HotGame:
+    return HotGame(
+        id=3,
+        player_white_id="white",
+        player_black_id=player_black_id,
+        game_type=GameType.MULTIPLAYER,
+        ai_difficulty=None,
+        fen="startpos",
+        status=GameStatus.ONGOING,
+        winner=Winner.ONGOING,
+    )
+
+
+def test_finished_game_survives_a_failed_write(monkeypatch):
+    async def main():
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        store = make_store(redis)
+        game = make_hot_game()
+        await store.save(game, None, [(0, 100)])
+
+        game.status = GameStatus.FINISHED
+        game.winner = Winner.DRAW
+        await store.save(game, RecordingSession(fail=True), [(1, 200)])
+        state = await redis.hgetall("game_state:3")
+        assert state["status"] == "finished"
+        assert await redis.smembers(DIRTY_KEY) == {"3"}
+        assert await redis.lrange("game_state:3:moves", 0, -1) == ["0:100", "1:200"]
+
+        # The next flush finishes the row and drops the hot state
+        session = RecordingSession()
+        monkeypatch.setattr(game_state, "SessionLocal", lambda: session)
+        assert await store.flush() == 1
+        assert session.committed
+        persisted, appended = session.statements
+        assert persisted[1][0]["b_status"] == GameStatus.FINISHED
+        assert [(row["ply"], row["move"]) for row in appended[1]] == [
+            (0, 100),
+            (1, 200),
+        ]
+        assert not await redis.exists("game_state:3")
+        assert await redis.smembers(DIRTY_KEY) == set()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("still_ongoing, rated", [(True, [3]), (False, [])])
+def test_only_games_finished_here_are_rated(monkeypatch, still_ongoing, rated):
+    rated_games = []
+
+    async def apply_ratings_batch(games, db):
+        rated_games.extend(game.id for game in games)
+
+    monkeypatch.setattr(game_state, "apply_ratings_batch", apply_ratings_batch)
+
+    async def main():
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        store = make_store(redis)
+        game = make_hot_game(player_black_id="black")
+        await store.save(game, None)
+        game.status = GameStatus.FINISHED
+        game.winner = Winner.WHITE
+        # The reaper may have finished the row in the meantime
+        session = RecordingSession(ids=[3] if still_ongoing else [])
+        await store.save(game, session)
+        assert session.committed
+
+    asyncio.run(main())
+    assert rated_games == rated
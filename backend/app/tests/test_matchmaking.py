@@ -0,0 +1,50 @@
+import pytest
+from app.services.matchmaking import pair_players
+
+WINDOW = 100
+GROWTH = 10  # Rating points per second waited
+
+
+@pytest.mark.parametrize(
+    "entries, pairs, leftovers",
+    [
+        # Within the base window right away
+        ([("a", 1500, 0), ("b", 1590, 0)], [("a", "b")], []),
+        ([("a", 1500, 0), ("b", 1650, 0)], [], ["a", "b"]),
+        # The window widens with the longer wait of the two
+        ([("a", 1500, 4), ("b", 1650, 0)], [], ["a", "b"]),
+        ([("a", 1500, 5), ("b", 1650, 0)], [("a", "b")], []),
+        ([("a", 1500, 0), ("b", 1650, 5)], [("a", "b")], []),
+        # Neighbours in rating order pair up, whatever the queue order
+        (
+            [("d", 1800, 0), ("a", 1500, 0), ("c", 1750, 0), ("b", 1520, 0)],
+            [("a", "b"), ("c", "d")],
+            [],
+        ),
+        # A player out of everyone's window waits; the rest still pair
+        (
+            [("a", 1500, 0), ("b", 1700, 0), ("c", 1750, 0)],
+            [("b", "c")],
+            ["a"],
+        ),
+        # An odd player out is left over
+        ([("a", 1500, 0), ("b", 1510, 0), ("c", 1520, 0)], [("a", "b")], ["c"]),
+        ([("a", 1500, 0)], [], ["a"]),
+        ([], [], []),
+    ],
+)
+def test_pair_players(entries, pairs, leftovers):
+    paired, unpaired = pair_players(entries, WINDOW, GROWTH)
+    assert paired == pairs
+    assert [user_id for user_id, _, _ in unpaired] == leftovers
+
+
+def test_waiting_players_pair_once_the_window_reaches_them():
+    entries = [("a", 1500, 0), ("b", 1800, 0)]
+    for waited in range(30):
+        pairs, _ = pair_players(
+            [(user_id, rating, waited) for user_id, rating, _ in entries],
+            WINDOW,
+            GROWTH,
+        )
+        assert bool(pairs) is (waited >= 20)
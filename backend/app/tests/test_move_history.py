@@ -0,0 +1,68 @@
+import chess
+from app.services.move_history import (
+    decode_move,
+    encode_move,
+    is_threefold_repetition,
+    push_move,
+)
+from app.services.game_state import HotGame
+from app.core.constants import GameStatus, GameType, Winner
+
+
+def new_game() -> HotGame:
+    return HotGame(
+        id=1,
+        player_white_id="white",
+        player_black_id="black",
+        game_type=GameType.MULTIPLAYER,
+        ai_difficulty=None,
+        fen="startpos",
+        status=GameStatus.ONGOING,
+        winner=Winner.ONGOING,
+    )
+
+
+def play(game: HotGame, *moves: str) -> list[tuple[int, int]]:
+    board = game.board()
+    return [push_move(game, board, board.parse_san(move)) for move in moves]
+
+
+def test_encode_decode_round_trip():
+    promotions = (None, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN)
+    for from_square in chess.SQUARES:
+        for to_square in chess.SQUARES:
+            for promotion in promotions:
+                move = chess.Move(from_square, to_square, promotion)
+                code = encode_move(move)
+                assert 0 <= code < 1 << 15
+                assert decode_move(code) == move
+
+
+def test_push_move_records_plies():
+    game = new_game()
+    records = play(game, "e4", "e5", "Nf3")
+    assert [ply for ply, _ in records] == [0, 1, 2]
+    assert [decode_move(code).uci() for _, code in records] == [
+        "e2e4",
+        "e7e5",
+        "g1f3",
+    ]
+    assert game.fen == chess.Board(game.fen).fen()
+    assert game.fen.split()[1] == "b"
+
+
+def test_threefold_repetition():
+    game = new_game()
+    play(game, "Nf3", "Nf6", "Ng1", "Ng8")
+    assert not is_threefold_repetition(game)  # The start position twice
+    play(game, "Nf3", "Nf6", "Ng1")
+    assert not is_threefold_repetition(game)
+    play(game, "Ng8")
+    assert is_threefold_repetition(game)
+
+
+def test_zeroing_move_resets_repetition_window():
+    game = new_game()
+    play(game, "Nf3", "Nf6", "Ng1", "Ng8", "e4")
+    play(game, "Nf6", "Nf3", "Ng8", "Ng1")
+    assert not is_threefold_repetition(game)
@@ -0,0 +1,104 @@
+from datetime import datetime
+from types import SimpleNamespace
+import chess
+from app.core.constants import AIDifficulty, GameType, Winner
+from app.services.move_history import encode_move
+from app.services.pgn import game_to_pgn, parse_games
+
+SCHOLARS_MATE = ["e2e4", "e7e5", "f1c4", "b8c6", "d1h5", "g8f6", "h5f7"]
+
+
+def make_game(moves: list[str], winner: Winner, **fields):
+    board = chess.Board()
+    for move in moves:
+        board.push_uci(move)
+    return SimpleNamespace(
+        id=42,
+        fen=board.fen(),
+        game_type=fields.get("game_type", GameType.MULTIPLAYER),
+        ai_difficulty=fields.get("ai_difficulty"),
+        winner=winner,
+        time_base=fields.get("time_base"),
+        time_increment=fields.get("time_increment", 0),
+        created_at=datetime(2026, 3, 14, 12, 0),
+    )
+
+
+def codes(moves: list[str]) -> list[int]:
+    return [encode_move(chess.Move.from_uci(move)) for move in moves]
+
+
+def test_export():
+    game = make_game(SCHOLARS_MATE, Winner.WHITE, time_base=300, time_increment=2)
+    text = game_to_pgn(game, codes(SCHOLARS_MATE), "alice", "bob")
+    assert "1. e4 e5 2. Bc4 Nc6 3. Qh5 Nf6 4. Qxf7# 1-0" in text
+    assert '[Date "2026.03.14"]' in text
+    assert '[White "alice"]' in text
+    assert '[TimeControl "300+2"]' in text
+    assert '[GameId "42"]' in text
+    assert "FEN" not in text
+
+
+def test_round_trip():
+    game = make_game(SCHOLARS_MATE, Winner.WHITE, time_base=300, time_increment=2)
+    text = game_to_pgn(game, codes(SCHOLARS_MATE), "alice", "bob")
+    assert "1. e4 e5 2. Bc4 Nc6 3. Qh5 Nf6 4. Qxf7# 1-0" in text
+
+    (parsed,), skipped = parse_games(text)
+    assert skipped == 0
+    assert (parsed.white, parsed.black) == ("alice", "bob")
+    assert parsed.winner == Winner.WHITE
+    assert parsed.moves == codes(SCHOLARS_MATE)
+    assert parsed.fen == game.fen
+    assert parsed.created_at == datetime(2026, 3, 14)
+    assert (parsed.time_base, parsed.time_increment) == (300, 2)
+
+
+def test_several_games_round_trip():
+    games = [
+        make_game(SCHOLARS_MATE, Winner.WHITE),
+        make_game(SCHOLARS_MATE[:4], Winner.DRAW),
+    ]
+    text = "".join(
+        game_to_pgn(game, codes(moves), "alice", "bob")
+        for game, moves in zip(games, (SCHOLARS_MATE, SCHOLARS_MATE[:4]))
+    )
+    parsed, skipped = parse_games(text)
+    assert skipped == 0
+    assert [game.winner for game in parsed] == [Winner.WHITE, Winner.DRAW]
+    assert [len(game.moves) for game in parsed] == [7, 4]
+
+
+def test_ai_opponent_is_named_after_the_engine():
+    game = make_game(
+        SCHOLARS_MATE[:2],
+        Winner.AI,
+        game_type=GameType.AI,
+        ai_difficulty=AIDifficulty.HARD,
+    )
+    text = game_to_pgn(game, codes(SCHOLARS_MATE[:2]), "alice", None)
+    assert '[Black "Stockfish (hard)"]' in text
+    assert '[Result "0-1"]' in text
+
+
+def test_history_starting_mid_game_exports_the_position():
+    game = make_game(SCHOLARS_MATE, Winner.WHITE)
+    text = game_to_pgn(game, codes(SCHOLARS_MATE[2:]), "alice", "bob", first_ply=2)
+    assert f'[FEN "{game.fen}"]' in text
+    assert '[SetUp "1"]' in text
+    # Imports only take games played from the start
+    assert parse_games(text) == ([], 1)
+
+
+def test_history_that_does_not_replay_exports_the_position():
+    game = make_game(SCHOLARS_MATE, Winner.WHITE)
+    text = game_to_pgn(game, codes(SCHOLARS_MATE[1:]), "alice", "bob")
+    assert f'[FEN "{game.fen}"]' in text
+
+
+def test_game_without_history_exports_the_position():
+    game = make_game([], Winner.DRAW)
+    game.fen = "startpos"
+    text = game_to_pgn(game, None, "alice", "bob")
+    assert "FEN" not in text
+    assert text.rstrip().endswith("1/2-1/2")
@@ -0,0 +1,55 @@
+import asyncio
+import chess
+from app.core.constants import AI_SEARCH_PROFILES, AIDifficulty
+from app.core.engine_pool import EnginePool
+from app.services.ponder import Ponderer
+
+PROFILE = AI_SEARCH_PROFILES[AIDifficulty.HARD]
+
+
+class SlowEngine:
+    async def play(self, board, limit):
+        await asyncio.sleep(10)
+
+
+def make_pool() -> EnginePool:
+    engine_pool = EnginePool(path="stockfish", size=3)
+    for _ in range(3):
+        engine = SlowEngine()
+        engine_pool._engines.append(engine)
+        engine_pool.release(engine)
+    return engine_pool
+
+
+def start(ponderer: Ponderer, engine_pool: EnginePool) -> chess.Board:
+    board = chess.Board()
+    ponderer.start(1, board, chess.Move.from_uci("e2e4"), engine_pool, PROFILE)
+    return board
+
+
+def test_a_miss_cancels_the_search():
+    async def main():
+        ponderer = Ponderer(enabled=True, max_sessions=4, result_ttl=60)
+        engine_pool = make_pool()
+        start(ponderer, engine_pool)
+        board = chess.Board()
+        board.push_uci("d2d4")
+        move = await ponderer.take(1, board)
+        await asyncio.sleep(0.01)
+        return move, ponderer.active, engine_pool.idle
+
+    assert asyncio.run(main()) == (None, 0, 3)
+
+
+def test_a_new_session_cancels_the_old_one():
+    async def main():
+        ponderer = Ponderer(enabled=True, max_sessions=4, result_ttl=60)
+        engine_pool = make_pool()
+        start(ponderer, engine_pool)
+        start(ponderer, engine_pool)
+        await asyncio.sleep(0.01)
+        active, idle = ponderer.active, engine_pool.idle
+        await ponderer.take(1, chess.Board())
+        return active, idle
+
+    assert asyncio.run(main()) == (1, 2)
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+import pytest
+from app.core.constants import (
+    AI_RATINGS,
+    RATING_K,
+    RATING_K_PROVISIONAL,
+    RATING_PROVISIONAL_GAMES,
+    AIDifficulty,
+    GameType,
+    Winner,
+)
+from app.services.ratings import expected_score, is_rated, rate_game
+
+
+def make_game(winner: Winner, game_type=GameType.MULTIPLAYER, **fields):
+    return SimpleNamespace(
+        winner=winner,
+        game_type=game_type,
+        ai_difficulty=fields.get("ai_difficulty"),
+        player_white_id=fields.get("player_white_id", "white"),
+        player_black_id=fields.get("player_black_id", "black"),
+    )
+
+
+def test_expected_score():
+    assert expected_score(1500, 1500) == pytest.approx(0.5)
+    assert expected_score(1900, 1500) == pytest.approx(10 / 11)
+    assert expected_score(1700, 1500) + expected_score(1500, 1700) == pytest.approx(1)
+
+
+def test_win_between_equal_new_players():
+    white, black = rate_game(make_game(Winner.WHITE), (1500.0, 0), (1500.0, 0))
+    assert white == (pytest.approx(1500 + RATING_K_PROVISIONAL / 2), 1)
+    assert black == (pytest.approx(1500 - RATING_K_PROVISIONAL / 2), 1)
+
+
+def test_draw_moves_ratings_together():
+    white, black = rate_game(
+        make_game(Winner.DRAW),
+        (1600.0, RATING_PROVISIONAL_GAMES),
+        (1400.0, RATING_PROVISIONAL_GAMES),
+    )
+    assert white[0] < 1600 and black[0] > 1400
+    # Established players exchange points at the lower K-factor
+    assert 1600 - white[0] == pytest.approx(black[0] - 1400)
+    assert 1600 - white[0] == pytest.approx(
+        RATING_K * (expected_score(1600, 1400) - 0.5)
+    )
+
+
+def test_ai_game_rates_only_the_player():
+    game = make_game(
+        Winner.AI,
+        GameType.AI,
+        ai_difficulty=AIDifficulty.HARD,
+        player_black_id=None,
+    )
+    white, black = rate_game(game, (1500.0, 0), None)
+    hard = AI_RATINGS[AIDifficulty.HARD]
+    assert black is None
+    assert white == (
+        pytest.approx(1500 - RATING_K_PROVISIONAL * expected_score(1500, hard)),
+        1,
+    )
+
+
+def test_is_rated():
+    assert is_rated(make_game(Winner.BLACK))
+    assert is_rated(make_game(Winner.AI, GameType.AI, player_black_id=None))
+    assert not is_rated(make_game(Winner.ONGOING))
+    assert not is_rated(make_game(Winner.WHITE, player_black_id=None))
+    assert not is_rated(make_game(Winner.WHITE, GameType.IMPORTED))
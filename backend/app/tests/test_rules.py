@@ -0,0 +1,23 @@
+import chess
+import pytest
+from fastapi import HTTPException
+from app.services.rules import parse_move
+
+
+@pytest.mark.parametrize(
+    "move, expected",
+    [
+        ("e2e4", "e2e4"),
+        ("e4", "e2e4"),
+        ("Nf3", "g1f3"),
+    ],
+)
+def test_legal_moves_parse(move, expected):
+    assert parse_move(chess.Board(), move) == chess.Move.from_uci(expected)
+
+
+@pytest.mark.parametrize("move", ["0000", "--", "e2e5", "Ke2", "xyz", ""])
+def test_null_and_illegal_moves_are_rejected(move):
+    with pytest.raises(HTTPException) as e:
+        parse_move(chess.Board(), move)
+    assert e.value.status_code == 400
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import fakeredis.aioredis
+import pytest
+from app.api.v1.endpoints import ws
+from app.services.game_events import decode
+
+
+class FakeHub:
+    """Hands out one queue that is already full, as for a client far behind."""
+
+    def __init__(self, queue_size: int):
+        self.queue = asyncio.Queue(queue_size)
+        for i in range(queue_size):
+            self.queue.put_nowait(f"event {i}")
+        self.unsubscribed = False
+
+    async def subscribe(self, channel: str) -> asyncio.Queue:
+        return self.queue
+
+    async def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        self.unsubscribed = True
+
+
+class FakeSocket:
+    def __init__(self, *frames: str):
+        self.incoming = asyncio.Queue()
+        for frame in frames:
+            self.incoming.put_nowait({"type": "websocket.receive", "text": frame})
+        self.sent = []
+        self.close_codes = []
+
+    async def receive(self) -> dict:
+        return await self.incoming.get()
+
+    async def send_text(self, data: str):
+        self.sent.append(data)
+
+    async def send_bytes(self, data: bytes):
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000):
+        self.close_codes.append(code)
+
+    def disconnect(self):
+        self.incoming.put_nowait({"type": "websocket.disconnect"})
+
+
+def test_acks_bypass_a_full_queue(monkeypatch):
+    async def main():
+        hub = FakeHub(queue_size=2)
+        monkeypatch.setattr(ws, "pubsub_hub", hub)
+        websocket = FakeSocket("frame 1", "frame 2")
+        stalled = asyncio.Event()  # Never set: the client reads nothing
+
+        async def on_message(data):
+            await stalled.wait()
+            return [data]
+
+        async def on_frame(frame):
+            if frame == "frame 2":
+                websocket.disconnect()
+            return f"ack {frame}"
+
+        await asyncio.wait_for(
+            ws.relay_channel(
+                websocket, "game_1", on_message=on_message, on_frame=on_frame
+            ),
+            timeout=5,
+        )
+        return hub, websocket
+
+    hub, websocket = asyncio.run(main())
+    assert websocket.sent == ["ack frame 1", "ack frame 2"]
+    assert hub.unsubscribed
+
+
+def test_dropped_client_is_closed_with_try_again_later(monkeypatch):
+    async def main():
+        hub = FakeHub(queue_size=1)
+        hub.queue.get_nowait()
+        hub.queue.put_nowait(None)  # What the hub leaves a dropped subscriber
+        monkeypatch.setattr(ws, "pubsub_hub", hub)
+        websocket = FakeSocket()
+        await asyncio.wait_for(ws.relay_channel(websocket, "game_1"), timeout=5)
+        return websocket
+
+    websocket = asyncio.run(main())
+    assert websocket.close_codes[0] == 1013
+
+
+class SnapshotConnection(ws.GameConnection):
+    """Answers snapshots with the sequence number they were taken at."""
+
+    def __init__(self, last_seq: int | None, snapshot_seq: int):
+        super().__init__(FakeSocket(), 1, "json", last_seq)
+        self.snapshot_seq = snapshot_seq
+
+    async def snapshot(self) -> dict:
+        self.last_seq = self.snapshot_seq
+        return {"type": "snapshot", "seq": self.snapshot_seq}
+
+
+@pytest.mark.parametrize(
+    "last_seq, seq, counter, snapshot_seq, sent, final_seq",
+    [
+        # First event on a fresh connection
+        (None, 3, 3, 3, [("move", 3)], 3),
+        # In order
+        (4, 5, 5, 5, [("move", 5)], 5),
+        # Gap; the snapshot predates the event, so the event follows it
+        (4, 7, 7, 6, [("snapshot", 6), ("move", 7)], 7),
+        # Gap; the snapshot already includes the event
+        (4, 7, 7, 7, [("snapshot", 7)], 7),
+        # Duplicate while the counter is ahead: already sent
+        (5, 4, 5, 5, [], 5),
+        # Counter started over after Redis lost it
+        (5, 1, 1, 1, [("snapshot", 1)], 1),
+        # Counter gone
+        (5, 1, None, 0, [("snapshot", 0), ("move", 1)], 1),
+    ],
+)
+def test_on_message_keeps_events_in_sequence(
+    monkeypatch, last_seq, seq, counter, snapshot_seq, sent, final_seq
+):
+    async def main():
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        if counter is not None:
+            await redis.set("game_events:1:seq", counter)
+        monkeypatch.setattr(ws, "redis_client", redis)
+        connection = SnapshotConnection(last_seq, snapshot_seq)
+        payloads = await connection.on_message(json.dumps({"type": "move", "seq": seq}))
+        return payloads, connection.last_seq
+
+    payloads, last = asyncio.run(main())
+    assert [(p["type"], p["seq"]) for p in map(decode, payloads)] == sent
+    assert last == final_seq
@@ -0,0 +1,109 @@
+"""Standalone engine worker.
+
+Consumes AI move jobs pushed by RemoteEngineBackend onto the Redis job lists
+(one per difficulty), searches them with the matching local engine pool and
+pushes the reply back.
+
+Run with: python -m app.workers.engine
+"""
+
+import asyncio
+import json
+import time
+import chess
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.constants import AIDifficulty
+from app.core.engine_backend import LocalEngineBackend, engine_queue_key
+from app.core.engine_pool import (
+    EnginePool,
+    EngineSupervisor,
+    close_engine_pools,
+    start_engine_pools,
+)
+from app.core.redis_client import is_redis_available, redis_client
+
+REPLY_TTL_SECONDS = 60
+
+
+async def handle_job(raw: str, backend: LocalEngineBackend):
+    job = json.loads(raw)
+    if job["deadline"] < time.time():
+        return  # The API already gave up on this job
+
+    try:
+        result = await backend.play(
+            chess.Board(job["fen"]), AIDifficulty(job["difficulty"])
+        )
+        reply = {
+            "move": result.move.uci(),
+            "ponder": result.ponder.uci() if result.ponder else None,
+            "shed": result.info.get("shed", False),
+        }
+    except HTTPException as e:
+        reply = {"error": e.detail}
+    except ValueError as e:
+        reply = {"error": f"Invalid engine job: {e}"}
+
+    await redis_client.rpush(job["reply_to"], json.dumps(reply))
+    await redis_client.expire(job["reply_to"], REPLY_TTL_SECONDS)
+
+
+# Take a difficulty's jobs only while its pool has an idle engine, so the rest
+# stay in Redis for other workers instead of waiting here for a busy pool
+async def consume(
+    difficulty: AIDifficulty, engine_pool: EnginePool, backend: LocalEngineBackend
+):
+    queue_key = engine_queue_key(settings.ENGINE_QUEUE_KEY, difficulty)
+    capacity = asyncio.Semaphore(engine_pool.size)
+    running: set[asyncio.Task] = set()
+
+    async def run(raw: str):
+        try:
+            await handle_job(raw, backend)
+        except Exception as e:
+            print(f"Engine job failed: {e}", flush=True)
+        finally:
+            capacity.release()
+
+    print(f"Engine worker consuming {queue_key}", flush=True)
+    try:
+        while True:
+            await capacity.acquire()
+            item = await redis_client.blpop(queue_key, timeout=5)
+            if item is None:
+                capacity.release()
+                continue
+            task = asyncio.create_task(run(item[1]))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    finally:
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+async def main():
+    await is_redis_available()
+    engine_pools = await start_engine_pools()
+    engine_supervisor = EngineSupervisor(
+        engine_pools=engine_pools,
+        interval=settings.STOCKFISH_HEALTHCHECK_INTERVAL,
+        ping_timeout=settings.STOCKFISH_PING_TIMEOUT,
+    )
+    engine_supervisor.start()
+    backend = LocalEngineBackend(engine_pools, settings.STOCKFISH_SEARCH_TIMEOUT)
+
+    try:
+        await asyncio.gather(
+            *(
+                consume(difficulty, engine_pool, backend)
+                for difficulty, engine_pool in engine_pools.items()
+            )
+        )
+    finally:
+        await engine_supervisor.close()
+        await close_engine_pools(engine_pools)
+        await redis_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
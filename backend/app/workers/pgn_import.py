@@ -0,0 +1,38 @@
+"""Bulk PGN import.
+
+Seeds the database with finished games from a PGN file of any size. Player
+names are matched to existing accounts by username; games where neither
+player has an account are skipped. Imported games are never rated.
+
+Run with: python -m app.workers.pgn_import games.pgn [--workers 8] [--batch 1000]
+"""
+
+import argparse
+import asyncio
+import os
+from app.services.pgn_import import PgnImporter
+
+
+async def run(path: str, workers: int, batch: int):
+    importer = PgnImporter(workers=workers, batch=batch)
+    with open(path, "rb") as file:
+        stats = await importer.run(lambda size: asyncio.to_thread(file.read, size))
+    print(
+        f"Imported {stats['imported']} games ({stats['moves']} moves), skipped "
+        f"{stats['skipped']} in {stats['seconds']}s "
+        f"({stats['rows_per_second']} rows/s)",
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.path, args.workers, args.batch))
+
+
+if __name__ == "__main__":
+    main()
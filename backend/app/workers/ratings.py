@@ -0,0 +1,83 @@
+"""Offline rating recompute.
+
+Resets every rating and replays all finished games in the order they
+finished, reading them in keyset-paginated batches over the
+(status, updated_at) index, then writes the results back in batches. Use it
+after changing the rating constants or to repair drift.
+
+Run with: python -m app.workers.ratings [--batch 5000]
+"""
+
+import argparse
+import asyncio
+import time
+from sqlalchemy import tuple_, update
+from sqlalchemy.future import select
+from app.core.constants import RATING_INITIAL, GameStatus
+from app.core.database import SessionLocal
+from app.models.game import Game
+from app.models.user import User
+from app.services.ratings import is_rated, rate_game, save_ratings
+
+
+async def recompute(batch: int):
+    started = time.perf_counter()
+    ratings, replayed, last = {}, 0, None
+    async with SessionLocal() as db:
+        while True:
+            stmt = (
+                select(
+                    Game.id,
+                    Game.updated_at,
+                    Game.game_type,
+                    Game.ai_difficulty,
+                    Game.player_white_id,
+                    Game.player_black_id,
+                    Game.winner,
+                )
+                .where(Game.status == GameStatus.FINISHED)
+                .order_by(Game.updated_at, Game.id)
+                .limit(batch)
+            )
+            if last is not None:
+                stmt = stmt.where(tuple_(Game.updated_at, Game.id) > last)
+            games = (await db.execute(stmt)).all()
+            if not games:
+                break
+            for game in games:
+                if not is_rated(game):
+                    continue
+                initial = (RATING_INITIAL, 0)
+                white, black = rate_game(
+                    game,
+                    ratings.get(game.player_white_id, initial),
+                    ratings.get(game.player_black_id, initial),
+                )
+                ratings[game.player_white_id] = white
+                if black is not None:
+                    ratings[game.player_black_id] = black
+                replayed += 1
+            last = (games[-1].updated_at, games[-1].id)
+
+        await db.execute(update(User).values(rating=RATING_INITIAL, rated_games=0))
+        items = list(ratings.items())
+        for i in range(0, len(items), batch):
+            await save_ratings(dict(items[i : i + batch]), db)
+        await db.commit()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Replayed {replayed} games for {len(ratings)} players in {elapsed:.1f}s",
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(recompute(args.batch))
+
+
+if __name__ == "__main__":
+    main()